@@ -0,0 +1,91 @@
+"""원형 프로필 이미지 생성 마이크로 벤치마크
+
+매번 원형 마스크와 중간 캔버스를 새로 만들던 기존 create_circular_image와 지름별로 캐시한
+원형 알파를 쓰는 현재 구현을 테마별로 비교하고, 두 결과가 픽셀 단위로 같은지도 확인합니다.
+각 항목은 REPEAT번 실행 평균 중 가장 빠른 값(5회)입니다.
+
+    python benchmarks/circular_avatar.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'image_generator'))
+
+from PIL import Image, ImageDraw
+from image_processor import ImageProcessor
+from theme import ThemeManager
+
+DIAMETER = 480
+REPEAT = 50
+
+
+def legacy_create_circular_image(image, diameter, theme):
+    """레이어 캐시 도입 전의 create_circular_image"""
+    image = image.resize((diameter, diameter), Image.Resampling.LANCZOS)
+
+    border_thickness = 15
+    total_diameter = diameter + (border_thickness * 2)
+    result = Image.new('RGBA', (total_diameter, total_diameter), (0, 0, 0, 0))
+
+    mask = Image.new('L', (diameter, diameter), 0)
+    mask_draw = ImageDraw.Draw(mask)
+    mask_draw.ellipse((0, 0, diameter, diameter), fill=255)
+
+    output = Image.new('RGBA', (diameter, diameter), (0, 0, 0, 0))
+    output.paste(image, (0, 0))
+    output.putalpha(mask)
+
+    result.paste(output, (border_thickness, border_thickness))
+
+    draw = ImageDraw.Draw(result)
+
+    if theme.border_style == 'glow':
+        for i in range(5):
+            alpha = int(255 * (0.3 - i * 0.05))
+            color = theme.border_color + (alpha,)
+            draw.ellipse((border_thickness - i*2, border_thickness - i*2,
+                          border_thickness + diameter + i*2, border_thickness + diameter + i*2),
+                         outline=color, width=border_thickness + i*2)
+
+    elif theme.border_style == 'double':
+        draw.ellipse((border_thickness - 5, border_thickness - 5,
+                      border_thickness + diameter + 5, border_thickness + diameter + 5),
+                     outline=theme.border_color, width=5)
+
+    draw.ellipse((border_thickness, border_thickness,
+                  border_thickness + diameter, border_thickness + diameter),
+                 outline=theme.border_color, width=border_thickness)
+
+    return result
+
+
+def best_ms(func) -> float:
+    return min(timeit.repeat(func, number=REPEAT, repeat=5)) / REPEAT * 1000
+
+
+def main():
+    theme_manager = ThemeManager()
+    # 480px는 리샘플링이 없어 마스크/테두리 처리 비용만 측정됨,
+    # 256px(디스코드 아바타 기본 크기)과 1024px는 LANCZOS 리샘플링 포함
+    avatars = {
+        'RGB 480': Image.radial_gradient('L').resize((DIAMETER, DIAMETER)).convert('RGB'),
+        'RGB 256': Image.radial_gradient('L').resize((256, 256)).convert('RGB'),
+        'RGBA 1024': Image.linear_gradient('L').resize((1024, 1024)).convert('RGBA'),
+    }
+
+    print(f"{'테마':<10} {'아바타':<10} {'기존(ms)':>10} {'현재(ms)':>10} {'배율':>6}")
+    for theme_name in theme_manager.get_available_themes():
+        theme = theme_manager.get_theme(theme_name)
+        for avatar_name, avatar in avatars.items():
+            legacy = legacy_create_circular_image(avatar, DIAMETER, theme)
+            current = ImageProcessor.create_circular_image(avatar, DIAMETER, theme)
+            assert legacy.tobytes() == current.tobytes(), f"결과가 다릅니다: {theme_name} {avatar_name}"
+
+            legacy_ms = best_ms(lambda: legacy_create_circular_image(avatar, DIAMETER, theme))
+            current_ms = best_ms(lambda: ImageProcessor.create_circular_image(avatar, DIAMETER, theme))
+            print(f"{theme_name:<10} {avatar_name:<10} {legacy_ms:10.2f} {current_ms:10.2f} {legacy_ms / current_ms:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
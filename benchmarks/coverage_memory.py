@@ -0,0 +1,81 @@
+"""폰트 coverage 표현 방식별 메모리 사용량 비교
+
+기존 방식({codepoint: glyph_name} dict)과 CoverageSet(범위 배열)을 같은 폰트들로 만들어
+tracemalloc으로 측정하고, 포함 여부 확인 속도도 함께 출력합니다.
+
+    python benchmarks/coverage_memory.py
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'image_generator'))
+
+from fontTools.ttLib import TTFont
+from font_coverage import CoverageSet
+from font_manager import FontManager
+
+
+def load_cmaps(available_fonts):
+    """폰트별 cmap dict 로드 (기존 font_cmap_cache와 같은 형태)"""
+    cmaps = {}
+    for font_name, path_info in available_fonts.items():
+        if isinstance(path_info, tuple):
+            tt_font = TTFont(path_info[0], fontNumber=path_info[1])
+        else:
+            tt_font = TTFont(path_info)
+        char_map = {}
+        if 'cmap' in tt_font:
+            for table in tt_font['cmap'].tables:
+                if hasattr(table, 'cmap'):
+                    char_map.update(table.cmap)
+        tt_font.close()
+        cmaps[font_name] = char_map
+    return cmaps
+
+
+def measure(build):
+    """build()가 만든 객체가 차지하는 메모리(바이트)와 객체 반환"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return size, result
+
+
+def lookup_time(coverage_by_font, probes):
+    start = time.perf_counter()
+    for coverage in coverage_by_font.values():
+        for char_code in probes:
+            char_code in coverage
+    return time.perf_counter() - start
+
+
+def main():
+    with contextlib.redirect_stdout(io.StringIO()):
+        font_manager = FontManager()
+    cmaps = load_cmaps(font_manager.available_fonts)
+    total_codes = sum(len(char_map) for char_map in cmaps.values())
+
+    # 측정 대상 객체만 새로 만들도록 원본 cmap을 복사/변환
+    dict_size, dict_coverage = measure(lambda: {name: dict(char_map) for name, char_map in cmaps.items()})
+    range_size, range_coverage = measure(lambda: {name: CoverageSet.from_codes(char_map) for name, char_map in cmaps.items()})
+
+    random.seed(0)
+    probes = [random.randrange(0, 0x20000) for _ in range(20000)]
+
+    print(f"폰트 {len(cmaps)}개, 코드포인트 {total_codes}개")
+    print(f"  dict       : {dict_size / 1024:10.1f} KiB, 조회 {lookup_time(dict_coverage, probes) * 1000:8.1f} ms")
+    print(f"  CoverageSet: {range_size / 1024:10.1f} KiB, 조회 {lookup_time(range_coverage, probes) * 1000:8.1f} ms")
+    if range_size > 0:
+        print(f"  메모리 절감: {dict_size / range_size:.1f}배")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,354 @@
+"""환영 이미지 생성 벤치마크 / 부하 생성기
+
+아바타·배경 이미지를 내려주는 로컬 HTTP 서버를 띄우고, 실제 닉네임과 비슷한 제목 모음
+(한글, CJK, 이모지 ZWJ 시퀀스, Fraktur 수학 문자, 카오모지 등)으로 테마별 요청을 보내
+지연 시간 p50/p95/p99, 처리량, 최대 RSS를 측정합니다. --output으로 결과를 JSON으로 저장하면
+커밋 사이의 결과를 비교할 수 있습니다.
+
+    # 프로세스 안에서 WelcomeImageGenerator 직접 호출
+    python benchmarks/welcome_load.py --requests 20 --concurrency 4
+
+    # 실행 중인 gRPC 서버(server.py / aio_server.py)로 요청
+    # (서버가 다른 호스트면 --fixture-host로 서버에서 접근할 수 있는 주소 지정)
+    python benchmarks/welcome_load.py --mode grpc --target localhost:50051 --server-pid 1234 --output result.json
+"""
+import argparse
+import contextlib
+import http.server
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'image_generator'))
+sys.path.append(ROOT)
+
+from PIL import Image
+
+THEMES = ['default', 'minimal', 'gradient', 'dark', 'colorful', 'gaming', 'cute']
+
+TITLES = [
+    # 한글
+    '김민준', '별빛여행자', '고양이집사123', '오늘도_열심히',
+    # CJK
+    '山田太郎', '小龙女', 'さくら🌸', '龍之介',
+    # 이모지 ZWJ 시퀀스
+    '👨‍👩‍👧‍👦 가족', '🏳️‍🌈 Rainbow', '🧑‍💻 dev', '🐻‍❄️ 북극곰',
+    # Fraktur / 수학 문자
+    '𝔏𝔦𝔩𝔦𝔱𝔥', '𝑬𝒍𝒍𝒂', '𝓜𝓪𝓻𝓲𝓮', '𝕯𝖆𝖗𝖐𝕷𝖔𝖗𝖉',
+    # 카오모지
+    '˵•́ ᴗ •̀˵', '(｡•̀ᴗ-)✧', 'ʕ•ᴥ•ʔ', '(ﾉ◕ヮ◕)ﾉ*:･ﾟ✧',
+    # 긴 이름 / 혼합
+    'A very long nickname that keeps going and going', 'Player_One ⚔️ 전사', 'xX_NoScope_Xx',
+]
+SUBTITLES = ['서버에 오신 것을 환영합니다!', 'Welcome to the server!', '즐거운 시간 보내세요 🎉']
+SUFFIXES = ['님,', '', '봇']
+
+AVATAR_COUNT = 8
+BACKGROUND_SIZE = (1920, 1080)
+
+
+class FixtureServer:
+    """벤치마크용 아바타/배경 이미지를 메모리에서 내려주는 HTTP 서버"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.files = self._make_files()
+        files = self.files
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                entry = files.get(self.path)
+                if entry is None:
+                    self.send_error(404)
+                    return
+                content_type, body = entry
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'max-age=3600')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f'http://{host}:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, name='fixture-http', daemon=True).start()
+
+    @staticmethod
+    def _make_files() -> Dict[str, tuple]:
+        files = {}
+        for i in range(AVATAR_COUNT):
+            # 디스코드 기본 아바타 크기(256px)의 서로 다른 이미지
+            avatar = Image.radial_gradient('L').resize((256, 256)).convert('RGB')
+            avatar = Image.merge('RGB', [band.point(lambda v, k=k: (v + 40 * i * k) % 256)
+                                         for k, band in enumerate(avatar.split(), start=1)])
+            files[f'/avatar/{i}.png'] = ('image/png', FixtureServer._encode(avatar, 'PNG'))
+
+        background = Image.linear_gradient('L').resize(BACKGROUND_SIZE).convert('RGB')
+        files['/background.jpg'] = ('image/jpeg', FixtureServer._encode(background, 'JPEG'))
+        return files
+
+    @staticmethod
+    def _encode(image: Image.Image, image_format: str) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format)
+        return buffer.getvalue()
+
+    def avatar_url(self, index: int) -> str:
+        return f'{self.base_url}/avatar/{index % AVATAR_COUNT}.png'
+
+    def background_url(self) -> str:
+        return f'{self.base_url}/background.jpg'
+
+    def close(self):
+        self.server.shutdown()
+
+
+def make_requests(fixtures: FixtureServer, theme: str, count: int, offset: int,
+                  with_background: bool) -> List[dict]:
+    """제목 모음을 돌려가며 generate_welcome_image 인자 목록 생성
+
+    결과 캐시에 걸리지 않도록 푸터에 요청마다 다른 번호를 넣습니다.
+    """
+    requests = []
+    for i in range(offset, offset + count):
+        requests.append(dict(
+            title_text=TITLES[i % len(TITLES)],
+            subtitle_text=SUBTITLES[i % len(SUBTITLES)],
+            avatar_url=fixtures.avatar_url(i),
+            bg_url=fixtures.background_url() if with_background else None,
+            header_text='WELCOME',
+            footer_text=f'{i + 1}번째 멤버',
+            strikeout=i % 10 == 0,
+            username_color_hex='#FFD700' if i % 3 == 0 else '',
+            suffix_text=SUFFIXES[i % len(SUFFIXES)],
+            theme_name=theme,
+        ))
+    return requests
+
+
+def in_process_runner(output_width: Optional[int], output_format: Optional[str]) -> Callable[[dict], int]:
+    from image_encoder import EncodeOptions
+    from welcome_image_generator import WelcomeImageGenerator
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator = WelcomeImageGenerator()
+    encode_options = EncodeOptions(format=output_format) if output_format else None
+
+    def run(kwargs: dict) -> int:
+        encoded = generator.generate_welcome_image(encode_options=encode_options, output_width=output_width, **kwargs)
+        return len(encoded.data)
+
+    return run
+
+
+def grpc_runner(target: str, output_width: Optional[int], output_format: Optional[str]) -> Callable[[dict], int]:
+    import grpc
+    try:
+        import welcome_image_service_pb2 as pb
+        import welcome_image_service_pb2_grpc as pb_grpc
+    except ImportError:
+        from proto_compiler import ProtoCompiler
+        ProtoCompiler(os.path.join(ROOT, 'proto'), ROOT).compile_protos()
+        import welcome_image_service_pb2 as pb
+        import welcome_image_service_pb2_grpc as pb_grpc
+
+    themes = {name: getattr(pb, f'THEME_{name.upper()}') for name in THEMES}
+    formats = {'png': pb.OUTPUT_PNG, 'webp': pb.OUTPUT_WEBP, 'jpeg': pb.OUTPUT_JPEG}
+    stub = pb_grpc.WelcomeImageServiceStub(grpc.insecure_channel(target))
+
+    def run(kwargs: dict) -> int:
+        request = pb.GenerateWelcomeImageRequest(
+            title_text=kwargs['title_text'],
+            subtitle_text=kwargs['subtitle_text'],
+            avatar_url=kwargs['avatar_url'],
+            bg_url=kwargs['bg_url'] or '',
+            header_text=kwargs['header_text'],
+            footer_text=kwargs['footer_text'],
+            strikeout=kwargs['strikeout'],
+            username_color_hex=kwargs['username_color_hex'],
+            suffix_text=kwargs['suffix_text'],
+            theme=themes[kwargs['theme_name']],
+            output_format=formats.get(output_format, pb.OUTPUT_DEFAULT),
+            output_width=output_width or 0,
+        )
+        response = stub.GenerateWelcomeImage(request, timeout=120)
+        if not response.success:
+            raise RuntimeError(response.error_message)
+        return len(response.image_data)
+
+    return run
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """nearest-rank 방식 백분위수"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies: List[float], sizes: List[int], errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    to_ms = lambda seconds: round(seconds * 1000, 2)
+    return {
+        'count': len(latencies),
+        'errors': errors,
+        'p50_ms': to_ms(percentile(ordered, 50)),
+        'p95_ms': to_ms(percentile(ordered, 95)),
+        'p99_ms': to_ms(percentile(ordered, 99)),
+        'mean_ms': to_ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+        'max_ms': to_ms(ordered[-1]) if ordered else 0.0,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        'mean_bytes': int(sum(sizes) / len(sizes)) if sizes else 0,
+    }
+
+
+def run_batch(run: Callable[[dict], int], requests: List[dict], concurrency: int) -> dict:
+    latencies: List[float] = []
+    sizes: List[int] = []
+    errors = []
+
+    def timed(kwargs: dict):
+        started = time.perf_counter()
+        try:
+            size = run(kwargs)
+        except Exception as e:
+            errors.append(str(e))
+            return
+        latencies.append(time.perf_counter() - started)
+        sizes.append(size)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, requests))
+    elapsed = time.perf_counter() - started
+
+    result = summarize(latencies, sizes, len(errors), elapsed)
+    if errors:
+        result['first_error'] = errors[0]
+    return result
+
+
+def peak_rss_kb(pid: Optional[int] = None) -> Optional[int]:
+    """최대 RSS (KB) - pid가 주어지면 /proc에서 그 프로세스의 VmHWM을 읽음"""
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='환영 이미지 생성 벤치마크')
+    parser.add_argument('--mode', choices=['inprocess', 'grpc'], default='inprocess')
+    parser.add_argument('--target', default='localhost:50051', help='gRPC 서버 주소 (--mode grpc)')
+    parser.add_argument('--server-pid', type=int, help='최대 RSS를 측정할 서버 프로세스 (--mode grpc)')
+    parser.add_argument('--themes', default=','.join(THEMES), help='쉼표로 구분한 테마 목록')
+    parser.add_argument('--requests', type=int, default=20, help='테마별 요청 수')
+    parser.add_argument('--warmup', type=int, default=2, help='테마별 측정 전 워밍업 요청 수')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--background', action='store_true', help='배경 이미지 URL 포함')
+    parser.add_argument('--output-width', type=int, help='출력 너비 (기본: 서버 설정)')
+    parser.add_argument('--format', choices=['png', 'webp', 'jpeg'], help='출력 형식 (기본: 서버 설정)')
+    parser.add_argument('--seed', type=int, default=0, help='혼합 측정에서 요청 순서를 섞을 시드')
+    parser.add_argument('--fixture-host', default='127.0.0.1', help='고정 이미지 HTTP 서버 주소')
+    parser.add_argument('--output', help='결과를 저장할 JSON 파일')
+    args = parser.parse_args()
+
+    fixtures = FixtureServer(args.fixture_host)
+    if args.mode == 'grpc':
+        run = grpc_runner(args.target, args.output_width, args.format)
+    else:
+        run = in_process_runner(args.output_width, args.format)
+
+    themes = [theme.strip() for theme in args.themes.split(',') if theme.strip()]
+    results: Dict[str, dict] = {}
+    all_requests = []
+    offset = 0
+
+    print(f"{'테마':<10} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'rps':>7} {'오류':>5}")
+    for theme in themes:
+        warmup = make_requests(fixtures, theme, args.warmup, offset, args.background)
+        offset += args.warmup
+        for kwargs in warmup:
+            run(kwargs)
+
+        requests = make_requests(fixtures, theme, args.requests, offset, args.background)
+        offset += args.requests
+        all_requests.extend(requests)
+
+        result = run_batch(run, requests, args.concurrency)
+        results[theme] = result
+        print(f"{theme:<10} {result['p50_ms']:9.1f} {result['p95_ms']:9.1f} {result['p99_ms']:9.1f} "
+              f"{result['throughput_rps']:7.2f} {result['errors']:5d}")
+
+    # 전체 지표는 테마를 섞은 요청으로 다시 측정 (실제 트래픽과 비슷하게, 시드가 같으면 같은 순서)
+    mixed = [dict(kwargs, footer_text=f"{offset + i + 1}번째 멤버") for i, kwargs in enumerate(all_requests)]
+    random.Random(args.seed).shuffle(mixed)
+    overall = run_batch(run, mixed, args.concurrency)
+    print(f"{'(혼합)':<10} {overall['p50_ms']:9.1f} {overall['p95_ms']:9.1f} {overall['p99_ms']:9.1f} "
+          f"{overall['throughput_rps']:7.2f} {overall['errors']:5d}")
+
+    rss_kb = peak_rss_kb(args.server_pid if args.mode == 'grpc' else None)
+    if rss_kb is not None:
+        print(f"최대 RSS: {rss_kb / 1024:.1f} MB")
+
+    report = {
+        'meta': {
+            'git_revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'mode': args.mode,
+            'target': args.target if args.mode == 'grpc' else None,
+            'requests_per_theme': args.requests,
+            'warmup': args.warmup,
+            'concurrency': args.concurrency,
+            'background': args.background,
+            'output_width': args.output_width,
+            'format': args.format,
+            'seed': args.seed,
+        },
+        'peak_rss_kb': rss_kb,
+        'overall': overall,
+        'themes': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.output}")
+
+    fixtures.close()
+
+
+if __name__ == '__main__':
+    main()
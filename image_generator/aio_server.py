@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Union
+
+import grpc
+
+from config import config
+from metrics import IMAGES, start_metrics_server
+from server import SharedFetches, WelcomeImageServiceServicer, welcome_image_service_pb2, welcome_image_service_pb2_grpc
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncWelcomeImageServiceServicer(WelcomeImageServiceServicer):
+    """grpc.aio용 servicer - 요청 변환과 응답 형식은 동기 servicer와 같음
+
+    아바타/배경은 렌더링 자리를 잡기 전에 비동기로 받아두고, 렌더링은 executor에서 실행합니다.
+    동시에 렌더링하는 요청은 max_concurrent_renders개로 제한하고, 처리 중인 요청이
+    max_concurrent_renders + queue_depth개를 넘으면 RESOURCE_EXHAUSTED로 바로 거절합니다.
+    배치 요청은 하나의 요청으로 받아들이고, 안의 이미지들은 같은 렌더링 자리를 나눠 씁니다.
+    배치 안의 이미지는 config.batch_window개씩 자기 아바타/배경을 받는 즉시 렌더링합니다.
+    """
+
+    def __init__(self, max_concurrent_renders: int, queue_depth: int):
+        super().__init__()
+        self.max_in_flight = max_concurrent_renders + queue_depth
+        self.in_flight = 0
+        self.render_slots = asyncio.Semaphore(max_concurrent_renders)
+        self.render_executor = ThreadPoolExecutor(max_workers=max_concurrent_renders, thread_name_prefix='aio-render')
+
+    async def _admit(self, context):
+        if self.in_flight >= self.max_in_flight:
+            logger.warning(f"처리 중인 요청이 너무 많아 거절: {self.in_flight}/{self.max_in_flight}")
+            IMAGES.inc(status='rejected')
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "서버가 처리할 수 있는 요청 수를 초과했습니다")
+
+    async def GenerateWelcomeImage(self, request, context):
+        await self._admit(context)
+
+        self.in_flight += 1
+        try:
+            logger.info(f"이미지 생성 요청 받음: {request.title_text} (테마: {request.theme})")
+            fetched = await self._fetch_urls_async(self._request_urls([request]))
+            return await self._render_async(request, fetched, self._profile_requested(context))
+        finally:
+            self.in_flight -= 1
+
+    async def GenerateWelcomeImages(self, request, context):
+        if len(request.requests) > config.batch_max_size:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                                f"배치 크기 초과: {len(request.requests)} > {config.batch_max_size}")
+        await self._admit(context)
+
+        self.in_flight += 1
+        tasks = []
+        try:
+            groups = self._group_duplicates(request.requests)
+            logger.info(f"배치 이미지 생성 요청 받음: {len(request.requests)}개 (중복 제외 {len(groups)}개)")
+
+            loop = asyncio.get_running_loop()
+            fetches = SharedFetches(lambda url: loop.run_in_executor(self.fetch_executor, self.fetcher.fetch, url))
+            window = asyncio.Semaphore(config.batch_window)
+            profiled = self._profiled_group(groups, context)
+
+            async def render_group(key, indices):
+                # 자기 아바타/배경을 받는 즉시 렌더링하고, 받은 내용은 끝나면 바로 놓음
+                item = request.requests[indices[0]]
+                urls = self._request_urls([item])
+                async with window:
+                    pending = fetches.acquire(urls)
+                    try:
+                        # 공유 future는 다른 이미지도 기다리므로 이 작업이 취소되어도 취소되지 않게 보호
+                        results = await asyncio.gather(*(asyncio.shield(future) for future in pending.values()),
+                                                       return_exceptions=True)
+                        fetched = dict(zip(pending, results))
+                        return indices, await self._render_async(item, fetched, key == profiled)
+                    finally:
+                        fetches.release(urls)
+
+            tasks = [asyncio.create_task(render_group(key, indices)) for key, indices in groups.items()]
+            for next_done in asyncio.as_completed(tasks):
+                indices, response = await next_done
+                for index in indices:
+                    yield welcome_image_service_pb2.GenerateWelcomeImagesResponse(index=index, result=response)
+        finally:
+            # 클라이언트가 스트림을 끊으면 남은 렌더링 취소
+            for task in tasks:
+                task.cancel()
+            self.in_flight -= 1
+
+    async def _fetch_urls_async(self, urls) -> Dict[str, Union[bytes, Exception]]:
+        """URL들을 동시에 받아 {url: 내용 또는 실패 예외} 반환"""
+        loop = asyncio.get_running_loop()
+        urls = list(urls)
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self.fetch_executor, self.fetcher.fetch, url) for url in urls),
+            return_exceptions=True)
+        return dict(zip(urls, results))
+
+    async def _render_async(self, request, fetched: Dict[str, Union[bytes, Exception]],
+                            profile_requested: bool = False):
+        """미리 받아둔 이미지로 요청 하나를 렌더링하여 응답 메시지 반환"""
+        try:
+            kwargs = self._generate_kwargs(request)
+            self._apply_prefetched(kwargs, fetched)
+
+            loop = asyncio.get_running_loop()
+            async with self.render_slots:
+                encoded = await loop.run_in_executor(
+                    self.render_executor, lambda: self._generate(kwargs, profile_requested))
+            return self._success_response(encoded)
+
+        except Exception as e:
+            return self._error_response(e)
+
+    def close(self):
+        super().close()
+        self.render_executor.shutdown(wait=False)
+
+
+async def serve():
+    server = grpc.aio.server()
+    servicer = AsyncWelcomeImageServiceServicer(
+        max_concurrent_renders=config.max_concurrent_renders,
+        queue_depth=config.render_queue_depth
+    )
+    welcome_image_service_pb2_grpc.add_WelcomeImageServiceServicer_to_server(servicer, server)
+
+    server.add_insecure_port(f'[::]:{config.grpc_port}')
+    await server.start()
+    logger.info(f"gRPC(asyncio) 서버가 포트 {config.grpc_port}에서 시작되었습니다.")
+    
+    metrics_server = None
+    if config.metrics_port:
+        metrics_server = start_metrics_server(config.metrics_host, config.metrics_port)
+        logger.info(f"지표 서버가 포트 {config.metrics_port}에서 시작되었습니다 (GET /metrics).")
+
+    # Graceful shutdown을 위한 이벤트
+    shutdown_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, shutdown_event.set)
+
+    try:
+        await shutdown_event.wait()
+    finally:
+        logger.info("서버 종료 중...")
+        await server.stop(grace=5)  # 5초 grace period
+        servicer.close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        logger.info("서버가 종료되었습니다.")
+
+
+if __name__ == '__main__':
+    asyncio.run(serve())
@@ -1,5 +1,8 @@
+import heapq
+import json
+from bisect import bisect_right
 from dataclasses import dataclass
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import unicodedata
 
 @dataclass
@@ -20,7 +23,13 @@ class CharacterAdjustment:
         return adjusted_x, adjusted_y
 
 class CharacterAdjustmentRules:
-    """문자별 조정 규칙 관리"""
+    """문자별 조정 규칙 관리
+    
+    범위 규칙은 겹치지 않는 구간의 정렬된 테이블로 만들어 이분 탐색하고, 문자별 결과는 캐시합니다.
+    규칙은 add_*_rule / load_rules_file로 추가하며, 규칙 dict를 직접 수정했다면 rebuild()를 호출해야 합니다.
+    """
+    # 문자별 조회 결과 캐시 최대 개수 (넘으면 비움)
+    LOOKUP_CACHE_SIZE = 65536
     
     def __init__(self):
         # 개별 문자 조정 규칙
@@ -32,8 +41,17 @@ class CharacterAdjustmentRules:
         # 유니코드 카테고리별 조정 규칙
         self.category_rules: Dict[str, CharacterAdjustment] = {}
         
+        # 규칙이 바뀔 때마다 증가 (조정 결과를 캐시하는 쪽에서 무효화 판단에 사용)
+        self.version = 0
+        
+        # 범위 규칙 조회 테이블 ([구간 시작], [구간 끝], [조정 값]) - 겹치면 먼저 추가된 규칙이 우선
+        self._range_index: Tuple[List[int], List[int], List[CharacterAdjustment]] = ([], [], [])
+        # 문자별 조회 결과 캐시 {char: 조정 값 또는 None}
+        self._lookup_cache: Dict[str, Optional[CharacterAdjustment]] = {}
+        
         # 기본 규칙 설정
         self._setup_default_rules()
+        self.rebuild()
     
     def _setup_default_rules(self):
         """기본 조정 규칙 설정"""
@@ -142,27 +160,128 @@ class CharacterAdjustmentRules:
     def add_char_rule(self, char: str, adjustment: CharacterAdjustment):
         """개별 문자에 대한 조정 규칙 추가"""
         self.char_rules[char] = adjustment
+        self.rebuild()
     
     def add_range_rule(self, start: int, end: int, adjustment: CharacterAdjustment):
         """유니코드 범위에 대한 조정 규칙 추가"""
         self.range_rules[(start, end)] = adjustment
+        self.rebuild()
     
     def add_category_rule(self, category: str, adjustment: CharacterAdjustment):
         """유니코드 카테고리에 대한 조정 규칙 추가"""
         self.category_rules[category] = adjustment
+        self.rebuild()
+    
+    def load_rules_file(self, path: str):
+        """JSON 파일에서 조정 규칙을 읽어 추가 (같은 범위/문자/카테고리는 덮어씀)
+        
+        형식 (범위 시작/끝은 정수 또는 "0x1D504" 같은 16진수 문자열, 조정 값 필드는 생략 가능):
+        {
+            "ranges": [{"start": "0x1D504", "end": "0x1D51D", "scale": 1.1, "offset_x": 0.0, "offset_y": 0.0}],
+            "chars": {"™": {"scale": 0.85, "offset_y": -25.0}},
+            "categories": {"So": {"scale": 1.05}}
+        }
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        for rule in data.get('ranges', []):
+            start, end = self._parse_codepoint(rule['start']), self._parse_codepoint(rule['end'])
+            if start > end:
+                raise ValueError(f"잘못된 범위 규칙: {rule['start']} > {rule['end']}")
+            self.range_rules[(start, end)] = self._parse_adjustment(rule)
+        for char, rule in data.get('chars', {}).items():
+            self.char_rules[char] = self._parse_adjustment(rule)
+        for category, rule in data.get('categories', {}).items():
+            self.category_rules[category] = self._parse_adjustment(rule)
+        
+        self.rebuild()
+        print(f"문자 조정 규칙 로드: {path} (범위 {len(data.get('ranges', []))}개, "
+              f"문자 {len(data.get('chars', {}))}개, 카테고리 {len(data.get('categories', {}))}개)")
+    
+    @staticmethod
+    def _parse_codepoint(value) -> int:
+        return int(value, 0) if isinstance(value, str) else int(value)
+    
+    @staticmethod
+    def _parse_adjustment(rule: dict) -> CharacterAdjustment:
+        return CharacterAdjustment(
+            scale=float(rule.get('scale', 1.0)),
+            offset_x=float(rule.get('offset_x', 0.0)),
+            offset_y=float(rule.get('offset_y', 0.0))
+        )
+    
+    def rebuild(self):
+        """범위 규칙 조회 테이블 재구성 및 문자별 캐시 초기화
+        
+        겹치는 범위는 기존 선형 탐색과 같이 먼저 추가된 규칙이 우선하도록, 경계마다 덮고 있는
+        규칙 중 가장 먼저 추가된 것을 골라 겹치지 않는 구간들로 펼칩니다.
+        """
+        rules = list(self.range_rules.items())
+        events = []
+        for order, ((start, end), _) in enumerate(rules):
+            events.append((start, order, True))
+            events.append((end + 1, order, False))
+        events.sort()
+        
+        active = [False] * len(rules)
+        heap = []
+        starts, ends, adjustments = [], [], []
+        prev_pos = None
+        i = 0
+        while i < len(events):
+            pos = events[i][0]
+            
+            while heap and not active[heap[0]]:
+                heapq.heappop(heap)
+            if heap and prev_pos is not None and prev_pos < pos:
+                adjustment = rules[heap[0]][1]
+                # 같은 규칙이 이어지면 하나의 구간으로 합침
+                if ends and ends[-1] == prev_pos - 1 and adjustments[-1] is adjustment:
+                    ends[-1] = pos - 1
+                else:
+                    starts.append(prev_pos)
+                    ends.append(pos - 1)
+                    adjustments.append(adjustment)
+            
+            while i < len(events) and events[i][0] == pos:
+                _, order, is_start = events[i]
+                active[order] = is_start
+                if is_start:
+                    heapq.heappush(heap, order)
+                i += 1
+            prev_pos = pos
+        
+        # 참조를 한 번에 교체하여 조회 중인 다른 스레드가 항상 일관된 테이블을 보도록 하고, 캐시도 새 dict로 교체
+        self._range_index = (starts, ends, adjustments)
+        self._lookup_cache = {}
+        self.version += 1
     
     def get_adjustment(self, char: str) -> Optional[CharacterAdjustment]:
-        """문자에 대한 조정 값 가져오기"""
+        """문자에 대한 조정 값 가져오기 (규칙 수와 관계없이 캐시 또는 이분 탐색으로 조회)"""
+        cache = self._lookup_cache
+        try:
+            return cache[char]
+        except KeyError:
+            pass
         
+        adjustment = self._find_adjustment(char)
+        if len(cache) >= self.LOOKUP_CACHE_SIZE:
+            cache.clear()
+        cache[char] = adjustment
+        return adjustment
+    
+    def _find_adjustment(self, char: str) -> Optional[CharacterAdjustment]:
         # 1. 개별 문자 규칙 확인
         if char in self.char_rules:
             return self.char_rules[char]
         
         # 2. 유니코드 범위 규칙 확인
         char_code = ord(char)
-        for (start, end), adjustment in self.range_rules.items():
-            if start <= char_code <= end:
-                return adjustment
+        starts, ends, adjustments = self._range_index
+        i = bisect_right(starts, char_code) - 1
+        if i >= 0 and char_code <= ends[i]:
+            return adjustments[i]
         
         # 3. 유니코드 카테고리 규칙 확인
         try:
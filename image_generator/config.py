@@ -7,6 +7,26 @@ class Config:
     grpc_host: str = "0.0.0.0"
     grpc_port: int = 50051
     
+    # gRPC 요청 처리 스레드 수
+    grpc_max_workers: int = int(os.environ.get('GRPC_MAX_WORKERS', '10'))
+    
+    # 렌더링 방식 ('thread': 요청 스레드에서 직접, 'process': 워커 프로세스 풀)
+    render_mode: str = os.environ.get('RENDER_MODE', 'thread').lower()
+    # 'process' 모드의 워커 프로세스 수 (0이면 CPU 코어 수)
+    render_processes: int = int(os.environ.get('RENDER_PROCESSES', '0')) or (os.cpu_count() or 1)
+    # 워커 하나가 처리할 최대 요청 수 (넘으면 새 프로세스로 교체, 0이면 무제한)
+    render_max_tasks_per_child: int = int(os.environ.get('RENDER_MAX_TASKS_PER_CHILD', '0'))
+    # asyncio 서버(aio_server.py)에서 동시에 렌더링할 최대 요청 수 (0이면 렌더링 워커 프로세스 수)
+    max_concurrent_renders: int = int(os.environ.get('MAX_CONCURRENT_RENDERS', '0')) or render_processes
+    # 실행 중인 요청 외에 대기할 수 있는 요청 수
+    render_queue_depth: int = int(os.environ.get('RENDER_QUEUE_DEPTH', '64'))
+    # 배치 요청(GenerateWelcomeImages) 하나에 담을 수 있는 최대 이미지 수
+    batch_max_size: int = int(os.environ.get('BATCH_MAX_SIZE', '500'))
+    # 배치 요청에서 동시에 다운로드/렌더링을 진행하는 이미지 수 (받아둔 아바타/배경을 메모리에 두는 이미지 수 상한)
+    batch_window: int = int(os.environ.get('BATCH_WINDOW', '32'))
+    # 요청 하나의 최대 렌더링 대기 시간 (초)
+    render_timeout: float = float(os.environ.get('RENDER_TIMEOUT', '60'))
+    
     # 환경 설정
     is_docker: bool = os.environ.get('IS_DOCKER_ENV', 'false').lower() == 'true'
     
@@ -14,6 +34,78 @@ class Config:
     proto_dir: str = "proto"  # 실제 디렉토리명에 맞춤
     proto_output_dir: str = "."  # 현재 디렉토리에 생성
     
+    # 이미지 다운로드 설정 (아바타/배경)
+    http_connect_timeout: float = float(os.environ.get('HTTP_CONNECT_TIMEOUT', '3.0'))
+    http_read_timeout: float = float(os.environ.get('HTTP_READ_TIMEOUT', '10.0'))
+    http_total_timeout: float = float(os.environ.get('HTTP_TOTAL_TIMEOUT', '15.0'))
+    http_max_download_bytes: int = int(os.environ.get('HTTP_MAX_DOWNLOAD_BYTES', str(10 * 1024 * 1024)))
+    http_pool_size: int = int(os.environ.get('HTTP_POOL_SIZE', '20'))
+    # 배경/프로필 이미지 동시 다운로드 스레드 수
+    fetch_workers: int = int(os.environ.get('FETCH_WORKERS', '20'))
+    # 다운로드 원본 캐시 (URL 기준, 0이면 사용 안 함)
+    http_cache_bytes: int = int(os.environ.get('HTTP_CACHE_BYTES', str(64 * 1024 * 1024)))
+    # Cache-Control max-age가 없는 응답의 유효 시간 (초)
+    http_cache_default_ttl: float = float(os.environ.get('HTTP_CACHE_DEFAULT_TTL', '300'))
+    # 가공된 배경/원형 프로필 이미지 캐시 (0이면 사용 안 함)
+    image_cache_bytes: int = int(os.environ.get('IMAGE_CACHE_BYTES', str(256 * 1024 * 1024)))
+    # 완성된 이미지 캐시 (같은 요청이면 렌더링 생략, 0이면 사용 안 함)
+    result_cache_bytes: int = int(os.environ.get('RESULT_CACHE_BYTES', str(64 * 1024 * 1024)))
+    # 완성된 이미지 캐시 유효 시간 (초)
+    result_cache_ttl: float = float(os.environ.get('RESULT_CACHE_TTL', '600'))
+    # 완성된 이미지를 파일로도 저장할 디렉토리 (빈 문자열이면 메모리에만 저장)
+    result_cache_dir: str = os.environ.get('RESULT_CACHE_DIR', '')
+    # 디스크 캐시 최대 크기 (바이트)
+    result_cache_disk_bytes: int = int(os.environ.get('RESULT_CACHE_DISK_BYTES', str(1024 * 1024 * 1024)))
+    # 디코딩을 허용할 최대 픽셀 수 (압축 폭탄 방지)
+    max_image_pixels: int = int(os.environ.get('MAX_IMAGE_PIXELS', '40000000'))
+    
+    # 결과 이미지 출력 설정 (요청에서 지정하지 않았을 때의 기본값)
+    # 출력 너비 (320 ~ 2880, 높이·레이아웃·폰트 크기는 비율에 맞춰 조정)
+    output_width: int = int(os.environ.get('OUTPUT_WIDTH', '2880'))
+    # 'png', 'webp', 'jpeg' (jpeg는 투명한 픽셀이 있으면 png로 대체)
+    output_format: str = os.environ.get('OUTPUT_FORMAT', 'png').lower()
+    # WebP/JPEG 품질 (1 ~ 100)
+    output_quality: int = int(os.environ.get('OUTPUT_QUALITY', '90'))
+    # WebP 무손실 압축 여부
+    output_lossless: bool = os.environ.get('OUTPUT_LOSSLESS', 'false').lower() == 'true'
+    # PNG 압축 레벨 (0 ~ 9, 낮을수록 빠르고 파일이 큼)
+    png_compress_level: int = int(os.environ.get('PNG_COMPRESS_LEVEL', '6'))
+    # WebP 인코딩 속도 (0 ~ 6, 낮을수록 빠르고 파일이 큼)
+    webp_method: int = int(os.environ.get('WEBP_METHOD', '4'))
+    
+    # 폰트 설정
+    font_cache_size: int = int(os.environ.get('FONT_CACHE_SIZE', '256'))
+    # 텍스트별 세그먼트 분할 결과(정규화·그래핌·폰트 선택) 캐시 최대 개수 (0이면 사용 안 함)
+    text_segment_cache_size: int = int(os.environ.get('TEXT_SEGMENT_CACHE_SIZE', '4096'))
+    # 폰트·크기·문자열별 텍스트 측정(getbbox) 결과 캐시 최대 개수 (0이면 사용 안 함)
+    text_measure_cache_size: int = int(os.environ.get('TEXT_MEASURE_CACHE_SIZE', '16384'))
+    # 추가 문자 조정 규칙(크기 배율/오프셋) JSON 파일 경로 (빈 값이면 기본 규칙만 사용)
+    character_adjustments_path: str = os.environ.get('CHARACTER_ADJUSTMENTS_PATH', '')
+    # 폰트별 지원 문자 범위를 저장해두는 캐시 파일 (빈 문자열이면 사용 안 함)
+    font_coverage_cache_path: str = os.environ.get('FONT_COVERAGE_CACHE_PATH', '/tmp/welcome_font_coverage.json')
+    
+    # 폰트 사용 리포트 설정 ('off', 'sampled', 'always')
+    font_report_mode: str = os.environ.get('FONT_REPORT_MODE', 'off').lower()
+    # 'sampled' 모드에서 리포트할 요청 비율 (0.0 ~ 1.0)
+    font_report_sample_rate: float = float(os.environ.get('FONT_REPORT_SAMPLE_RATE', '0.01'))
+    
+    # 요청 프로파일링 설정 ('off', 'sampled', 'always') - 'sampled'면 PROFILE_METADATA_KEY 메타데이터로 요청한 경우도 포함
+    profile_mode: str = os.environ.get('PROFILE_MODE', 'off').lower()
+    # 'sampled' 모드에서 프로파일링할 요청 비율 (0.0 ~ 1.0, 0이면 메타데이터로 요청한 경우만)
+    profile_sample_rate: float = float(os.environ.get('PROFILE_SAMPLE_RATE', '0.01'))
+    # 프로파일링한 요청 중 이 시간(초) 이상 걸린 것만 저장
+    profile_slow_seconds: float = float(os.environ.get('PROFILE_SLOW_SECONDS', '1.0'))
+    # 프로파일과 요청 필드를 저장할 디렉토리
+    profile_dir: str = os.environ.get('PROFILE_DIR', '/tmp/welcome_profiles')
+    # 저장된 프로파일 전체 최대 크기 (바이트, 넘으면 오래된 것부터 삭제)
+    profile_max_bytes: int = int(os.environ.get('PROFILE_MAX_BYTES', str(64 * 1024 * 1024)))
+    # 클라이언트가 프로파일링을 요청할 때 쓰는 gRPC 메타데이터 키 (값이 '1' 또는 'true')
+    profile_metadata_key: str = os.environ.get('PROFILE_METADATA_KEY', 'x-welcome-profile').lower()
+    
+    # Prometheus 형식 지표(/metrics) HTTP 포트 (0이면 사용 안 함)
+    metrics_port: int = int(os.environ.get('METRICS_PORT', '0'))
+    metrics_host: str = os.environ.get('METRICS_HOST', '0.0.0.0')
+    
     @property
     def grpc_server_address(self) -> str:
         return f"{self.grpc_host}:{self.grpc_port}"
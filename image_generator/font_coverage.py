@@ -0,0 +1,56 @@
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Tuple
+
+
+class CoverageSet:
+    """정렬된 [시작, 끝] 코드포인트 범위 배열로 표현한 폰트 지원 문자 집합
+
+    폰트의 cmap은 대부분 연속된 블록이라 코드포인트별 dict 대신 범위 배열만 저장하고
+    포함 여부는 이분 탐색으로 확인합니다.
+    """
+    __slots__ = ('starts', 'ends', '_size')
+
+    def __init__(self, starts: Iterable[int] = (), ends: Iterable[int] = ()):
+        self.starts = array('I', starts)
+        self.ends = array('I', ends)
+        self._size = sum(end - start + 1 for start, end in zip(self.starts, self.ends))
+
+    @classmethod
+    def from_codes(cls, codes: Iterable[int]) -> 'CoverageSet':
+        """코드포인트 목록으로 생성"""
+        starts, ends = [], []
+        for char_code in sorted(set(codes)):
+            if ends and ends[-1] == char_code - 1:
+                ends[-1] = char_code
+            else:
+                starts.append(char_code)
+                ends.append(char_code)
+        return cls(starts, ends)
+
+    @classmethod
+    def from_flat_ranges(cls, ranges: List[int]) -> 'CoverageSet':
+        """[시작, 끝, 시작, 끝, ...] 형태의 범위 목록으로 생성"""
+        return cls(ranges[0::2], ranges[1::2])
+
+    def to_flat_ranges(self) -> List[int]:
+        """[시작, 끝, 시작, 끝, ...] 형태의 범위 목록으로 변환 (디스크 캐시용)"""
+        flat = []
+        for start, end in zip(self.starts, self.ends):
+            flat.extend((start, end))
+        return flat
+
+    def ranges(self) -> Iterator[Tuple[int, int]]:
+        """(시작, 끝) 범위들을 순서대로 반환"""
+        return zip(self.starts, self.ends)
+
+    def __contains__(self, char_code: int) -> bool:
+        i = bisect_right(self.starts, char_code) - 1
+        return i >= 0 and char_code <= self.ends[i]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[int]:
+        for start, end in zip(self.starts, self.ends):
+            yield from range(start, end + 1)
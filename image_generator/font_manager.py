@@ -1,11 +1,22 @@
+import hashlib
+import heapq
+import json
 import os
-from typing import Dict, List, Optional, Set
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
 from PIL import ImageFont
 from fontTools.ttLib import TTFont
 import unicodedata
+from font_coverage import CoverageSet
+from font_usage import FontUsage, FontUsageStats
 
 class FontManager:
-    def __init__(self):
+    # 디스크 coverage 캐시 포맷 버전 (포맷이 바뀌면 올려서 기존 캐시 무효화)
+    COVERAGE_CACHE_VERSION = 1
+    
+    def __init__(self, font_cache_size: int = 256, coverage_cache_path: Optional[str] = None):
         # 시스템에 설치된 다양한 폰트 경로 (TTC 파일의 경우 인덱스 포함)
         self.font_paths = {
             # 한국어 폰트 (나눔)
@@ -213,14 +224,27 @@ class FontManager:
             'font_awesome'          # 78순위: FontAwesome
         ]
         
-        # 폰트 'cmap' 테이블 캐시
+        # 폰트별 지원 코드포인트 캐시 {font_name: CoverageSet}
         self.font_cmap_cache = {}
-        # 지원되지 않는 문자들을 추적
-        self.unsupported_characters = set()
-        # 지원되는 문자들과 사용된 폰트를 추적
-        self.supported_characters = {}  # {char: font_name}
+        # 지원 코드포인트를 저장해두는 디스크 캐시 파일 (None이면 사용 안 함)
+        self.coverage_cache_path = coverage_cache_path
+        # 전체 요청에 걸친 폰트별 렌더링 문자 수 (요청별 기록은 FontUsage 사용)
+        self.usage_stats = FontUsageStats()
         self._load_font_cmaps()
         
+        # 코드포인트 → 첫 번째 지원 폰트 범위 테이블 (우선순위 변경시 재구성)
+        self._resolution_index = None
+        # 폰트 구성 해시 (configuration_fingerprint에서 계산, 구성이 바뀌면 초기화)
+        self._fingerprint = None
+        self._rebuild_resolution_index()
+        
+        # 크기별 폰트 객체 캐시 (LRU) - {(font_name, size, layout_engine): FreeTypeFont}
+        self.font_cache_size = font_cache_size
+        self._font_cache: "OrderedDict[Tuple[str, int, int], ImageFont.FreeTypeFont]" = OrderedDict()
+        self._font_cache_lock = threading.Lock()
+        self.font_cache_hits = 0
+        self.font_cache_misses = 0
+        
         print(f"총 {len(self.available_fonts)}개의 폰트가 사용 가능합니다.")
         print(f"폰트 우선순위 목록에 {len(self.font_priority)}개 폰트가 등록되어 있습니다.")
     
@@ -231,6 +255,7 @@ class FontManager:
         if os.path.exists(font_path):
             self.font_paths[font_name] = path_info
             self.available_fonts[font_name] = path_info
+            self._evict_font_objects(font_name)
             
             # 우선순위 목록에 추가
             if font_name not in self.font_priority:
@@ -242,6 +267,7 @@ class FontManager:
             # cmap 로드
             try:
                 self._load_single_font_cmap(font_name, path_info)
+                self._rebuild_resolution_index()
                 print(f"폰트 추가됨: {font_name} -> {font_path} (우선순위: {self.font_priority.index(font_name) + 1})")
                 return True
             except Exception as e:
@@ -264,6 +290,9 @@ class FontManager:
             
         if font_name in self.font_cmap_cache:
             del self.font_cmap_cache[font_name]
+        
+        self._evict_font_objects(font_name)
+        self._rebuild_resolution_index()
             
         print(f"폰트 제거됨: {font_name}")
     
@@ -277,6 +306,7 @@ class FontManager:
         else:
             self.font_priority.append(font_name)
         
+        self._rebuild_resolution_index()
         print(f"폰트 우선순위 변경: {font_name} -> {self.font_priority.index(font_name) + 1}순위")
     
     def get_font_priority_list(self) -> List[str]:
@@ -292,7 +322,7 @@ class FontManager:
         print("========================\n")
     
     def _load_single_font_cmap(self, font_name: str, path_info):
-        """단일 폰트의 cmap 테이블 로드"""
+        """단일 폰트의 cmap 테이블을 분석하여 지원 코드포인트 로드"""
         try:
             if isinstance(path_info, tuple):
                 font_path, font_index = path_info
@@ -302,43 +332,238 @@ class FontManager:
                 tt_font = TTFont(font_path)
             
             if 'cmap' in tt_font:
-                char_map = {}
+                codes = set()
                 for table in tt_font['cmap'].tables:
                     if hasattr(table, 'cmap'):
-                        char_map.update(table.cmap)
+                        codes.update(table.cmap)
                 
-                self.font_cmap_cache[font_name] = char_map
-                print(f"폰트 {font_name}: {len(char_map)}개 문자 지원")
+                self.font_cmap_cache[font_name] = CoverageSet.from_codes(codes)
+                print(f"폰트 {font_name}: {len(codes)}개 문자 지원")
             else:
-                self.font_cmap_cache[font_name] = {}
+                self.font_cmap_cache[font_name] = CoverageSet()
                 
             tt_font.close()
         except Exception as e:
             print(f"폰트 {font_name} cmap 로드 실패: {e}")
-            self.font_cmap_cache[font_name] = {}
+            self.font_cmap_cache[font_name] = CoverageSet()
     
     def _load_font_cmaps(self):
-        """모든 사용 가능한 폰트의 cmap 테이블을 미리 로드"""
+        """모든 사용 가능한 폰트의 cmap 테이블을 미리 로드 (디스크 캐시가 유효하면 재사용)"""
+        cached_entries = self._read_coverage_cache()
+        entries = {}
+        reparsed = 0
+        
         for font_name, path_info in self.available_fonts.items():
-            self._load_single_font_cmap(font_name, path_info)
+            key, stamp = self._coverage_cache_key(path_info)
+            entry = cached_entries.get(key)
+            
+            if entry is not None and entry.get('stamp') == stamp:
+                self.font_cmap_cache[font_name] = CoverageSet.from_flat_ranges(entry['ranges'])
+            else:
+                self._load_single_font_cmap(font_name, path_info)
+                entry = {'stamp': stamp, 'ranges': self.font_cmap_cache[font_name].to_flat_ranges()}
+                reparsed += 1
+            
+            entries[key] = entry
+        
+        if self.coverage_cache_path:
+            print(f"폰트 coverage 캐시: {len(entries) - reparsed}개 재사용, {reparsed}개 분석")
+            if reparsed or len(entries) != len(cached_entries):
+                self._write_coverage_cache(entries)
+    
+    @staticmethod
+    def _coverage_cache_key(path_info) -> Tuple[str, List[int]]:
+        """디스크 캐시 키(경로+인덱스)와 유효성 확인용 (크기, mtime) 반환"""
+        if isinstance(path_info, tuple):
+            font_path, font_index = path_info
+        else:
+            font_path, font_index = path_info, None
+        
+        key = f"{font_path}#{font_index}" if font_index is not None else font_path
+        try:
+            stat = os.stat(font_path)
+            stamp = [stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            stamp = None
+        return key, stamp
+    
+    def _read_coverage_cache(self) -> Dict[str, dict]:
+        """디스크 coverage 캐시 읽기 (없거나 손상된 경우 빈 dict)"""
+        if not self.coverage_cache_path or not os.path.exists(self.coverage_cache_path):
+            return {}
+        try:
+            with open(self.coverage_cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != self.COVERAGE_CACHE_VERSION:
+                return {}
+            return data.get('fonts', {})
+        except Exception as e:
+            print(f"폰트 coverage 캐시 읽기 실패: {e}")
+            return {}
+    
+    def _write_coverage_cache(self, entries: Dict[str, dict]):
+        """디스크 coverage 캐시 쓰기 (임시 파일에 쓴 뒤 교체하여 동시 실행되는 워커와 충돌 방지)"""
+        tmp_path = f"{self.coverage_cache_path}.{os.getpid()}.tmp"
+        try:
+            cache_dir = os.path.dirname(self.coverage_cache_path)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.COVERAGE_CACHE_VERSION, 'fonts': entries}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.coverage_cache_path)
+        except Exception as e:
+            print(f"폰트 coverage 캐시 쓰기 실패: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    
+    def load_font(self, font_name: str, size: int,
+                  layout_engine: int = ImageFont.Layout.RAQM) -> ImageFont.FreeTypeFont:
+        """캐시를 거쳐 크기별 폰트 객체 반환 (로드 실패시 예외 발생)"""
+        key = (font_name, size, layout_engine)
+        with self._font_cache_lock:
+            font = self._font_cache.get(key)
+            if font is not None:
+                self._font_cache.move_to_end(key)
+                self.font_cache_hits += 1
+                return font
+            self.font_cache_misses += 1
+        
+        path_info = self.available_fonts[font_name]
+        if isinstance(path_info, tuple):
+            font_path, font_index = path_info
+            font = ImageFont.truetype(font_path, size, index=font_index, layout_engine=layout_engine)
+        else:
+            font = ImageFont.truetype(path_info, size, layout_engine=layout_engine)
+        
+        with self._font_cache_lock:
+            # 다른 스레드가 먼저 넣었다면 그 객체를 재사용
+            cached = self._font_cache.get(key)
+            if cached is not None:
+                self._font_cache.move_to_end(key)
+                return cached
+            self._font_cache[key] = font
+            while len(self._font_cache) > self.font_cache_size:
+                self._font_cache.popitem(last=False)
+        return font
+    
+    def _evict_font_objects(self, font_name: str):
+        """특정 폰트의 캐시된 폰트 객체 제거"""
+        with self._font_cache_lock:
+            for key in [key for key in self._font_cache if key[0] == font_name]:
+                del self._font_cache[key]
+    
+    def clear_font_cache(self):
+        """폰트 객체 캐시 초기화"""
+        with self._font_cache_lock:
+            self._font_cache.clear()
+            self.font_cache_hits = 0
+            self.font_cache_misses = 0
+    
+    def get_font_cache_stats(self) -> Dict[str, int]:
+        """폰트 객체 캐시 통계 반환"""
+        with self._font_cache_lock:
+            return {
+                'size': len(self._font_cache),
+                'max_size': self.font_cache_size,
+                'hits': self.font_cache_hits,
+                'misses': self.font_cache_misses,
+            }
+    
+    def configuration_fingerprint(self) -> str:
+        """폰트 구성(우선순위, 폰트 파일 크기/수정 시각) 해시 - 구성이 바뀌면 값도 바뀜"""
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for name in self.font_priority:
+                if name in self.available_fonts:
+                    key, stamp = self._coverage_cache_key(self.available_fonts[name])
+                    digest.update(json.dumps([name, key, stamp]).encode('utf-8'))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+    
+    def _rebuild_resolution_index(self):
+        """우선순위 목록 기준으로 코드포인트별 첫 번째 지원 폰트의 범위 테이블 재구성"""
+        # 폰트 추가/삭제/우선순위 변경 시 호출되므로 구성 해시도 다시 계산하도록 초기화
+        self._fingerprint = None
+        order = [name for name in self.font_priority
+                 if name in self.available_fonts and name in self.font_cmap_cache]
+        
+        # 범위 시작/끝 이벤트를 훑으면서 각 구간을 덮는 가장 높은 우선순위(가장 작은 rank)를 기록
+        events = []
+        for rank, font_name in enumerate(order):
+            for start, end in self.font_cmap_cache[font_name].ranges():
+                events.append((start, rank, True))
+                events.append((end + 1, rank, False))
+        events.sort()
+        
+        active = [False] * len(order)
+        heap = []
+        starts, ends, ranks = [], [], []
+        prev_pos = None
+        i = 0
+        while i < len(events):
+            pos = events[i][0]
+            
+            while heap and not active[heap[0]]:
+                heapq.heappop(heap)
+            if heap and prev_pos is not None:
+                rank = heap[0]
+                # 연속된 구간이 같은 폰트로 해석되면 하나의 범위로 합침
+                if ends and ends[-1] == prev_pos - 1 and ranks[-1] == rank:
+                    ends[-1] = pos - 1
+                else:
+                    starts.append(prev_pos)
+                    ends.append(pos - 1)
+                    ranks.append(rank)
+            
+            while i < len(events) and events[i][0] == pos:
+                _, rank, is_start = events[i]
+                active[rank] = is_start
+                if is_start:
+                    heapq.heappush(heap, rank)
+                i += 1
+            prev_pos = pos
+        
+        rank_of = {font_name: rank for rank, font_name in enumerate(order)}
+        # 참조를 한 번에 교체하여 다른 스레드가 항상 일관된 테이블을 보도록 함
+        self._resolution_index = (order, rank_of, starts, ends, ranks)
+    
+    def find_font_for_cluster(self, cluster: str, after: Optional[str] = None) -> Optional[str]:
+        """클러스터의 모든 문자를 지원하는 우선순위상 첫 번째 폰트 이름 반환
+        
+        after가 주어지면 그 폰트보다 뒤 순위에서만 찾습니다 (폰트 로드 실패시 다음 후보용).
+        """
+        order, rank_of, starts, ends, ranks = self._resolution_index
+        
+        # 모든 문자를 지원하는 폰트는 각 문자의 첫 지원 폰트보다 앞 순위일 수 없음
+        candidate = rank_of[after] + 1 if after in rank_of else 0
+        for char in cluster:
+            char_code = ord(char)
+            i = bisect_right(starts, char_code) - 1
+            if i < 0 or char_code > ends[i]:
+                return None
+            candidate = max(candidate, ranks[i])
+        
+        for rank in range(candidate, len(order)):
+            if self.font_covers(order[rank], cluster):
+                return order[rank]
+        
+        return None
+    
+    def font_covers(self, font_name: str, text: str) -> bool:
+        """문자 추적 없이 폰트가 text의 모든 문자를 지원하는지 확인"""
+        char_map = self.font_cmap_cache.get(font_name)
+        if char_map is None:
+            return False
+        return all(ord(char) in char_map for char in text)
     
     def font_supports_character(self, font_name: str, char: str) -> bool:
         """fontTools cmap 테이블을 사용하여 폰트가 특정 문자를 지원하는지 확인"""
         if font_name not in self.font_cmap_cache:
             return False
         
-        char_code = ord(char)
-        is_supported = char_code in self.font_cmap_cache[font_name]
-        
-        if is_supported:
-            # 지원되는 문자 추적 (첫 번째로 찾은 폰트 기록)
-            if char not in self.supported_characters:
-                self.supported_characters[char] = font_name
-        else:
-            # 지원되지 않는 문자 추적
-            self.unsupported_characters.add(char)
-        
-        return is_supported
+        return ord(char) in self.font_cmap_cache[font_name]
     
     def font_supports_cluster(self, font_name: str, cluster: str) -> bool:
         """폰트가 그래핌 클러스터의 모든 문자를 지원하는지 확인"""
@@ -355,28 +580,18 @@ class FontManager:
     def get_font_for_character(self, char: str, size: int) -> Optional[ImageFont.FreeTypeFont]:
         """특정 문자에 대해 지원하는 폰트 찾기 (우선순위 기준)"""
         # 우선순위대로 폰트 시도
-        for font_name in self.font_priority:
-            if font_name in self.available_fonts and self.font_supports_character(font_name, char):
-                try:
-                    path_info = self.available_fonts[font_name]
-                    if isinstance(path_info, tuple):
-                        font_path, font_index = path_info
-                        return ImageFont.truetype(font_path, size, index=font_index, layout_engine=ImageFont.Layout.RAQM)
-                    else:
-                        return ImageFont.truetype(path_info, size, layout_engine=ImageFont.Layout.RAQM)
-                except Exception:
-                    continue
+        font_name = self.find_font_for_cluster(char)
+        while font_name:
+            try:
+                return self.load_font(font_name, size)
+            except Exception:
+                font_name = self.find_font_for_cluster(char, after=font_name)
         
         # 우선순위 목록에 없는 나머지 폰트들도 시도
         for font_name in self.available_fonts:
             if font_name not in self.font_priority and self.font_supports_character(font_name, char):
                 try:
-                    path_info = self.available_fonts[font_name]
-                    if isinstance(path_info, tuple):
-                        font_path, font_index = path_info
-                        return ImageFont.truetype(font_path, size, index=font_index, layout_engine=ImageFont.Layout.RAQM)
-                    else:
-                        return ImageFont.truetype(path_info, size, layout_engine=ImageFont.Layout.RAQM)
+                    return self.load_font(font_name, size)
                 except Exception:
                     continue
         
@@ -388,37 +603,27 @@ class FontManager:
         if preferred_font_name and preferred_font_name in self.available_fonts:
             if self.font_supports_cluster(preferred_font_name, cluster):
                 try:
-                    path_info = self.available_fonts[preferred_font_name]
-                    if isinstance(path_info, tuple):
-                        font_path, font_index = path_info
-                        return ImageFont.truetype(font_path, size, index=font_index, layout_engine=ImageFont.Layout.RAQM)
-                    else:
-                        return ImageFont.truetype(path_info, size, layout_engine=ImageFont.Layout.RAQM)
+                    return self.load_font(preferred_font_name, size)
                 except Exception:
                     pass
         
         # 우선순위대로 폰트 시도
-        for font_name in self.font_priority:
-            if font_name in self.available_fonts and self.font_supports_cluster(font_name, cluster):
-                try:
-                    path_info = self.available_fonts[font_name]
-                    if isinstance(path_info, tuple):
-                        font_path, font_index = path_info
-                        return ImageFont.truetype(font_path, size, index=font_index, layout_engine=ImageFont.Layout.RAQM)
-                    else:
-                        return ImageFont.truetype(path_info, size, layout_engine=ImageFont.Layout.RAQM)
-                except Exception:
-                    continue
+        font_name = self.find_font_for_cluster(cluster)
+        while font_name:
+            try:
+                return self.load_font(font_name, size)
+            except Exception:
+                font_name = self.find_font_for_cluster(cluster, after=font_name)
         
         return None
     
-    def get_unsupported_characters_report(self) -> str:
+    def get_unsupported_characters_report(self, usage: FontUsage) -> str:
         """지원되지 않는 문자들의 리포트 생성"""
-        if not self.unsupported_characters:
+        if not usage.unsupported_characters:
             return "모든 문자가 지원됩니다."
         
-        report = f"지원되지 않는 문자 {len(self.unsupported_characters)}개:\n"
-        for char in sorted(self.unsupported_characters):
+        report = f"지원되지 않는 문자 {len(usage.unsupported_characters)}개:\n"
+        for char in sorted(usage.unsupported_characters):
             char_code = ord(char)
             char_name = ""
             try:
@@ -430,19 +635,19 @@ class FontManager:
         
         return report
     
-    def get_supported_characters_report(self) -> str:
+    def get_supported_characters_report(self, usage: FontUsage) -> str:
         """지원되는 문자들의 리포트 생성"""
-        if not self.supported_characters:
+        if not usage.supported_characters:
             return "지원되는 문자가 없습니다."
         
         # 폰트별로 그룹화
         font_groups = {}
-        for char, font_name in self.supported_characters.items():
+        for char, font_name in usage.supported_characters.items():
             if font_name not in font_groups:
                 font_groups[font_name] = []
             font_groups[font_name].append(char)
         
-        report = f"지원되는 문자 {len(self.supported_characters)}개 (폰트별 분류):\n\n"
+        report = f"지원되는 문자 {len(usage.supported_characters)}개 (폰트별 분류):\n\n"
         
         # 우선순위 순으로 정렬
         sorted_fonts = []
@@ -539,23 +744,23 @@ class FontManager:
         }
         return category_names.get(category, f"알수없음({category})")
     
-    def get_font_usage_statistics(self) -> str:
+    def get_font_usage_statistics(self, usage: FontUsage) -> str:
         """폰트 사용 통계 리포트 생성"""
-        if not self.supported_characters:
+        if not usage.supported_characters:
             return "폰트 사용 통계가 없습니다."
         
         # 폰트별 사용 횟수 계산
         font_usage = {}
-        for font_name in self.supported_characters.values():
+        for font_name in usage.supported_characters.values():
             font_usage[font_name] = font_usage.get(font_name, 0) + 1
         
         # 사용 횟수 순으로 정렬
         sorted_usage = sorted(font_usage.items(), key=lambda x: x[1], reverse=True)
         
-        report = f"폰트 사용 통계 (총 {len(self.supported_characters)}개 문자):\n\n"
+        report = f"폰트 사용 통계 (총 {len(usage.supported_characters)}개 문자):\n\n"
         
         for i, (font_name, count) in enumerate(sorted_usage, 1):
-            percentage = (count / len(self.supported_characters)) * 100
+            percentage = (count / len(usage.supported_characters)) * 100
             priority = "순위권 밖"
             if font_name in self.font_priority:
                 priority = f"{self.font_priority.index(font_name) + 1}순위"
@@ -564,23 +769,13 @@ class FontManager:
         
         return report
     
-    def clear_character_tracking(self):
-        """문자 추적 정보 초기화"""
-        self.supported_characters.clear()
-        self.unsupported_characters.clear()
-
     def get_font(self, size: int, font_type: str = 'default') -> ImageFont.FreeTypeFont:
         """폰트 객체 반환 - 폴백 지원 (font_type 파라미터는 호환성을 위해 유지)"""
         # 우선순위대로 폰트 시도
         for font_name in self.font_priority:
             if font_name in self.available_fonts:
                 try:
-                    path_info = self.available_fonts[font_name]
-                    if isinstance(path_info, tuple):
-                        font_path, font_index = path_info
-                        return ImageFont.truetype(font_path, size, index=font_index, layout_engine=ImageFont.Layout.RAQM)
-                    else:
-                        return ImageFont.truetype(path_info, size, layout_engine=ImageFont.Layout.RAQM)
+                    return self.load_font(font_name, size)
                 except Exception:
                     continue
         
@@ -588,12 +783,7 @@ class FontManager:
         for font_name in self.available_fonts:
             if font_name not in self.font_priority:
                 try:
-                    path_info = self.available_fonts[font_name]
-                    if isinstance(path_info, tuple):
-                        font_path, font_index = path_info
-                        return ImageFont.truetype(font_path, size, index=font_index, layout_engine=ImageFont.Layout.RAQM)
-                    else:
-                        return ImageFont.truetype(path_info, size, layout_engine=ImageFont.Layout.RAQM)
+                    return self.load_font(font_name, size)
                 except Exception:
                     continue
         
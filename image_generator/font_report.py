@@ -0,0 +1,87 @@
+import queue
+import random
+import threading
+from typing import Optional
+
+from font_manager import FontManager
+from font_usage import FontUsage
+
+
+class FontReportLogger:
+    """요청별 폰트 사용 리포트를 백그라운드 스레드에서 만들어 출력
+
+    mode:
+        'off'     - 리포트를 만들지 않음
+        'sampled' - sample_rate 비율의 요청만 리포트
+        'always'  - 모든 요청 리포트
+    """
+    MODES = ('off', 'sampled', 'always')
+
+    def __init__(self, font_manager: FontManager, mode: str = 'off',
+                 sample_rate: float = 0.01, max_pending: int = 100):
+        if mode not in self.MODES:
+            print(f"알 수 없는 폰트 리포트 모드: {mode}, 'off' 사용")
+            mode = 'off'
+
+        self.font_manager = font_manager
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self._queue: "queue.Queue[FontUsage]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self.dropped = 0
+
+    def should_report(self) -> bool:
+        """이번 요청의 폰트 사용을 기록/리포트할지 결정"""
+        if self.mode == 'always':
+            return True
+        if self.mode == 'sampled':
+            return random.random() < self.sample_rate
+        return False
+
+    def submit(self, usage: FontUsage):
+        """요청이 끝난 뒤의 폰트 사용 기록을 리포트 대기열에 추가 (가득 차면 버림)"""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(usage)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='font-report-logger', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            usage = self._queue.get()
+            try:
+                self._print_font_reports(usage)
+            except Exception as e:
+                print(f"폰트 리포트 생성 실패: {e}")
+
+    def _print_font_reports(self, usage: FontUsage):
+        """폰트 관련 리포트들을 출력"""
+        lines = ["", "=" * 60, "🔍 폰트 사용 분석 리포트", "=" * 60]
+
+        # 1. 폰트 사용 통계
+        usage_report = self.font_manager.get_font_usage_statistics(usage)
+        if "폰트 사용 통계가 없습니다." not in usage_report:
+            lines += ["", "📊 폰트 사용 통계:", "-" * 40, usage_report]
+
+        # 2. 지원되지 않는 문자 리포트
+        unsupported_report = self.font_manager.get_unsupported_characters_report(usage)
+        if "모든 문자가 지원됩니다." not in unsupported_report:
+            lines += ["", "❌ 지원되지 않는 문자:", "-" * 40, unsupported_report]
+
+        # 3. 지원되는 문자 리포트 (디버깅용)
+        supported_report = self.font_manager.get_supported_characters_report(usage)
+        if "지원되는 문자가 없습니다." not in supported_report:
+            lines += ["", "✅ 지원되는 문자 (상세):", "-" * 40, supported_report]
+
+        lines.append("=" * 60)
+        # 다른 출력과 섞이지 않도록 한 번에 출력
+        print("\n".join(lines))
@@ -0,0 +1,62 @@
+import threading
+from typing import Dict, List, Optional, Set
+
+
+class FontUsage:
+    """요청 하나에서 어떤 문자가 어떤 폰트로 렌더링되었는지 기록하는 컨텍스트
+
+    요청마다 새로 만들어 TextRenderer에 넘기므로 동시 요청끼리 기록이 섞이지 않습니다.
+    """
+
+    def __init__(self):
+        # 지원되는 문자들과 사용된 폰트 {char: font_name}
+        self.supported_characters: Dict[str, str] = {}
+        # 어떤 폰트도 지원하지 않는 문자들
+        self.unsupported_characters: Set[str] = set()
+
+    def record(self, text: str, font_name: Optional[str]):
+        """text를 렌더링한 폰트 기록 (font_name이 None이면 지원되지 않는 문자로 기록)"""
+        if font_name is None:
+            self.unsupported_characters.update(text)
+            return
+        for char in text:
+            if char not in self.supported_characters:
+                self.supported_characters[char] = font_name
+
+
+class FontUsageStats:
+    """모든 요청에 걸친 폰트 사용 누적 카운터
+
+    스레드마다 자기 dict(샤드)에만 쓰므로 렌더링 경로에서 락을 잡지 않고,
+    조회할 때만 샤드들을 합산합니다.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Dict[str, int]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict[str, int]:
+        shard = getattr(self._local, 'counts', None)
+        if shard is None:
+            shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.counts = shard
+        return shard
+
+    def add(self, key: str, count: int = 1):
+        """카운터 증가"""
+        shard = self._shard()
+        shard[key] = shard.get(key, 0) + count
+
+    def snapshot(self) -> Dict[str, int]:
+        """모든 샤드를 합산한 카운터 반환"""
+        with self._shards_lock:
+            shards = list(self._shards)
+
+        total: Dict[str, int] = {}
+        for shard in shards:
+            for key, count in shard.copy().items():
+                total[key] = total.get(key, 0) + count
+        return total
@@ -0,0 +1,162 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from byte_cache import ByteBudgetCache
+
+
+class FetchError(Exception):
+    """이미지 다운로드 실패 (크기 초과, 시간 초과 등)"""
+
+
+@dataclass
+class CachedResponse:
+    """URL별로 캐시해둔 응답 본문과 재검증 정보"""
+    content: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float  # time.monotonic() 기준
+
+
+class HttpFetcher:
+    """커넥션 풀을 공유하는 HTTP 다운로더
+
+    같은 호스트(디스코드 CDN 등)로의 연결을 keep-alive로 재사용하고,
+    연결/읽기/전체 시간 제한과 최대 다운로드 크기를 적용합니다.
+    cache_bytes > 0이면 응답 본문을 URL 기준으로 캐시하며 Cache-Control / ETag를 따릅니다.
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, connect_timeout: float = 3.0, read_timeout: float = 10.0,
+                 total_timeout: float = 15.0, max_bytes: int = 10 * 1024 * 1024,
+                 pool_size: int = 20, cache_bytes: int = 0, default_ttl: float = 300.0):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.max_bytes = max_bytes
+        # Cache-Control에 max-age가 없을 때 사용할 유효 시간 (초)
+        self.default_ttl = default_ttl
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.cache = ByteBudgetCache(cache_bytes, name='http') if cache_bytes > 0 else None
+        self.revalidations = 0
+        self.not_modified = 0
+
+    def fetch(self, url: str) -> bytes:
+        """URL의 내용을 다운로드하여 바이트로 반환 (캐시가 유효하면 캐시 사용)"""
+        cached = self.cache.get(url) if self.cache is not None else None
+        if cached is not None and time.monotonic() < cached.expires_at:
+            return cached.content
+
+        request_headers = {}
+        if cached is not None:
+            self.revalidations += 1
+            if cached.etag:
+                request_headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                request_headers['If-Modified-Since'] = cached.last_modified
+
+        status, content, response_headers = self._download(url, request_headers)
+
+        previous = None
+        if status == 304:
+            if cached is None:
+                raise FetchError(f"캐시 없이 304 응답을 받았습니다 ({url})")
+            self.not_modified += 1
+            content = cached.content
+            previous = cached
+
+        if self.cache is not None:
+            self._store(url, content, response_headers, previous)
+        return content
+
+    def _download(self, url: str, request_headers: Dict[str, str]) -> Tuple[int, bytes, Dict[str, str]]:
+        deadline = time.monotonic() + self.total_timeout
+
+        with self.session.get(url, headers=request_headers, stream=True,
+                              timeout=(self.connect_timeout, self.read_timeout)) as response:
+            response.raise_for_status()
+            if response.status_code == 304:
+                return 304, b"", response.headers
+
+            content_length = self._content_length(response)
+            if content_length is not None and content_length > self.max_bytes:
+                raise FetchError(f"다운로드 크기 초과: {content_length} bytes > {self.max_bytes} bytes ({url})")
+
+            data = bytearray()
+            for chunk in response.iter_content(self.CHUNK_SIZE):
+                data += chunk
+                if len(data) > self.max_bytes:
+                    raise FetchError(f"다운로드 크기 초과: {self.max_bytes} bytes 이상 ({url})")
+                if time.monotonic() > deadline:
+                    raise FetchError(f"다운로드 시간 초과: {self.total_timeout}초 ({url})")
+
+            return response.status_code, bytes(data), response.headers
+
+    def _store(self, url: str, content: bytes, response_headers,
+               previous: Optional[CachedResponse] = None) -> None:
+        """Cache-Control에 따라 응답을 캐시에 저장
+
+        previous: 304 응답으로 재검증한 기존 캐시 항목 (304에 없는 검증자는 기존 값을 유지)
+        """
+        directives = self._parse_cache_control(response_headers.get('Cache-Control', ''))
+        if 'no-store' in directives:
+            return
+
+        if 'no-cache' in directives:
+            ttl = 0.0
+        elif 'max-age' in directives:
+            try:
+                ttl = float(directives['max-age'])
+            except ValueError:
+                ttl = 0.0
+        else:
+            ttl = self.default_ttl
+
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        if previous is not None:
+            # 304는 ETag/Last-Modified를 다시 보내지 않아도 되므로 빠진 값은 기존 항목에서 가져옴
+            etag = etag or previous.etag
+            last_modified = last_modified or previous.last_modified
+        # 만료된 뒤 재검증할 방법도 없으면 저장할 의미가 없음
+        if ttl <= 0 and not etag and not last_modified:
+            return
+
+        self.cache.put(url, CachedResponse(content, etag, last_modified, time.monotonic() + ttl), len(content))
+
+    @staticmethod
+    def _parse_cache_control(value: str) -> Dict[str, str]:
+        directives = {}
+        for part in value.split(','):
+            name, _, arg = part.strip().partition('=')
+            if name:
+                directives[name.lower()] = arg.strip('"')
+        return directives
+
+    @staticmethod
+    def _content_length(response: requests.Response) -> Optional[int]:
+        try:
+            return int(response.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return None
+
+    def get_cache_stats(self) -> Dict[str, object]:
+        """응답 캐시 통계 반환"""
+        if self.cache is None:
+            return {}
+        stats = self.cache.stats()
+        stats['revalidations'] = self.revalidations
+        stats['not_modified'] = self.not_modified
+        return stats
+
+    def close(self):
+        """커넥션 풀 정리"""
+        self.session.close()
@@ -0,0 +1,83 @@
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Dict, Optional
+
+from PIL import Image
+
+
+@dataclass(frozen=True)
+class EncodeOptions:
+    """결과 이미지 인코딩 설정
+
+    format:
+        'png'  - 무손실, compress_level(0~9)로 속도/크기 조절 (1이면 빠르고 크기는 조금 큼)
+        'webp' - lossless=True면 무손실, 아니면 quality(1~100) 손실 압축
+        'jpeg' - quality(1~100) 손실 압축, 투명하면 PNG로 대신 인코딩 (알파 채널은 버림)
+    """
+    format: str = 'png'
+    quality: int = 90
+    lossless: bool = False
+    compress_level: int = 6
+    # WebP 인코딩 속도 (0이 가장 빠름, 6이 가장 작음)
+    webp_method: int = 4
+
+
+@dataclass
+class EncodedImage:
+    """인코딩된 이미지와 MIME 타입"""
+    data: bytes
+    mime_type: str
+    # 생성 단계별 소요 시간 (초) - 지표 기록용, 캐시에서 꺼낸 결과면 처음 생성할 때의 값
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    # 요청대로 만들지 못한 결과인지 (예: 배경 다운로드 실패로 테마 배경 사용) - 결과 캐시에 저장하지 않음
+    degraded: bool = False
+
+
+FORMATS = ('png', 'webp', 'jpeg')
+
+MIME_TYPES = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+
+
+def encode_image(image: Image.Image, options: EncodeOptions,
+                 transparent: Optional[bool] = None) -> EncodedImage:
+    """이미지를 options에 맞는 형식으로 인코딩
+
+    transparent: JPEG로 인코딩해도 되는지 판단할 투명 여부 (None이면 image에서 직접 확인)
+    """
+    if options.format not in FORMATS:
+        raise ValueError(f"지원하지 않는 출력 형식: {options.format} (지원: {', '.join(FORMATS)})")
+
+    image_format = options.format
+    if image_format == 'jpeg':
+        if transparent is None:
+            transparent = has_transparency(image)
+        if transparent:
+            image_format = 'png'
+
+    buffer = BytesIO()
+    if image_format == 'png':
+        image.save(buffer, format='PNG', compress_level=_clamp(options.compress_level, 0, 9))
+    elif image_format == 'webp':
+        image.save(buffer, format='WEBP', lossless=options.lossless,
+                   quality=_clamp(options.quality, 1, 100), method=_clamp(options.webp_method, 0, 6))
+    else:
+        # 서브샘플링 없이(4:4:4) 저장해야 색이 있는 글자 테두리가 번지지 않음
+        image.convert('RGB').save(buffer, format='JPEG', quality=_clamp(options.quality, 1, 100),
+                                  subsampling=0)
+
+    return EncodedImage(buffer.getvalue(), MIME_TYPES[image_format])
+
+
+def has_transparency(image: Image.Image) -> bool:
+    """불투명하지 않은 픽셀이 하나라도 있는지 확인"""
+    if image.mode == 'RGBA':
+        return image.getchannel('A').getextrema()[0] < 255
+    return image.mode in ('LA', 'PA') or 'transparency' in image.info
+
+
+def _clamp(value: int, low: int, high: int) -> int:
+    return max(low, min(high, value))
@@ -1,103 +1,251 @@
-import requests
+import hashlib
+import math
+from functools import lru_cache
 from io import BytesIO
+from typing import Dict, Optional, Tuple
 from PIL import Image, ImageDraw
 from theme import Theme
+from http_fetcher import HttpFetcher
+from byte_cache import ByteBudgetCache
+from metrics import StageTimer, timed
 
 class ImageProcessor:
+    # 리샘플링 전에 미리 줄일 때 최종 크기의 몇 배 이상은 남겨둘지 (LANCZOS 품질 유지용)
+    REDUCING_GAP = 2
+    
+    def __init__(self, fetcher: Optional[HttpFetcher] = None, image_cache_bytes: int = 0,
+                 max_image_pixels: int = 40_000_000):
+        # 모든 요청이 공유하는 다운로더 (커넥션 풀 재사용)
+        self.fetcher = fetcher or HttpFetcher()
+        # 디코딩을 허용할 최대 픽셀 수 (압축 폭탄 방지)
+        self.max_image_pixels = max_image_pixels
+        # 가공이 끝난 배경/원형 프로필 이미지 캐시 {(종류, 내용 해시, 테마, 크기...): Image}
+        self.image_cache = ByteBudgetCache(image_cache_bytes, name='image') if image_cache_bytes > 0 else None
+    
+    @staticmethod
+    def _content_key(data: bytes) -> str:
+        """이미지 원본 내용 해시 (같은 이미지가 다른 URL로 와도 캐시 공유)"""
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+    
     @staticmethod
-    def load_background_image(bg_url: str, width: int, height: int, theme: Theme) -> Image.Image:
-        """URL에서 배경 이미지 로드 및 처리"""
+    def _image_size_bytes(image: Image.Image) -> int:
+        return image.width * image.height * len(image.getbands())
+    
+    def _cached_image(self, key) -> Optional[Image.Image]:
+        return self.image_cache.get(key) if self.image_cache is not None else None
+    
+    def _store_image(self, key, image: Image.Image):
+        if self.image_cache is not None:
+            self.image_cache.put(key, image, self._image_size_bytes(image))
+    
+    def load_background_image(self, bg_url: str, width: int, height: int, theme: Theme,
+                              data: Optional[bytes] = None, timer: Optional[StageTimer] = None,
+                              fallback: bool = True) -> Image.Image:
+        """URL에서 배경 이미지 로드 및 처리 (반환된 이미지는 호출자가 수정해도 됨)
+        
+        data: 이미 받아둔 이미지 내용 (주어지면 다운로드하지 않음)
+        timer: 다운로드(fetch_bg)와 가공(background) 시간을 기록할 타이머
+        fallback: 실패하면 테마 배경을 반환 (False면 예외를 그대로 전달)
+        """
         try:
-            response = requests.get(bg_url)
-            response.raise_for_status()
-            bg_image = Image.open(BytesIO(response.content))
-            
-            if bg_image.mode != 'RGBA':
-                bg_image = bg_image.convert('RGBA')
-            
-            bg_width, bg_height = bg_image.size
-            scale = max(width / bg_width, height / bg_height)
-            
-            new_width = int(bg_width * scale)
-            new_height = int(bg_height * scale)
-            
-            bg_image = bg_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            left = (new_width - width) // 2
-            top = (new_height - height) // 2
-            bg_image = bg_image.crop((left, top, left + width, top + height))
-            
-            if theme.overlay_opacity > 0:
-                overlay = Image.new('RGBA', (width, height), (0, 0, 0, int(255 * theme.overlay_opacity)))
-                bg_image = Image.alpha_composite(bg_image, overlay)
-            
-            return bg_image
+            if data is None:
+                with timed(timer, 'fetch_bg'):
+                    data = self.fetcher.fetch(bg_url)
+            with timed(timer, 'background'):
+                key = ('background', self._content_key(data), theme.name, width, height)
+                cached = self._cached_image(key)
+                if cached is not None:
+                    # 캐시된 원본은 공유되므로 그 위에 그리지 않도록 복사본 반환
+                    return cached.copy()
+                
+                bg_image = self._prepare_background(data, width, height, theme)
+                self._store_image(key, bg_image)
+                return bg_image.copy() if self.image_cache is not None else bg_image
             
         except Exception as e:
+            if not fallback:
+                raise
             print(f"배경 이미지 로드 실패: {e}, 기본 배경 사용")
-            return ImageProcessor.create_background(width, height, theme)
+            return self.create_background(width, height, theme, timer)
+    
+    def decode_image(self, data: bytes, target_size: Tuple[int, int], cover: bool = False) -> Image.Image:
+        """이미지 디코딩 - target_size보다 훨씬 큰 이미지는 가까운 해상도로 줄여서 디코딩
+        
+        JPEG는 draft()로 디코딩 단계에서 1/2~1/8로 줄이고, 그래도 큰 이미지는 reduce()로
+        최종 크기의 REDUCING_GAP배 근처까지 줄입니다. 결과는 항상 target_size 이상입니다.
+        
+        cover: target_size를 비율을 유지한 채 덮는 크기를 목표로 함 (배경처럼 잘라 쓸 이미지용)
+        """
+        image = Image.open(BytesIO(data))
+        
+        # 헤더만 읽은 상태에서 크기 확인 (픽셀 데이터는 아직 디코딩 전)
+        if image.width * image.height > self.max_image_pixels:
+            raise Image.DecompressionBombError(
+                f"이미지가 너무 큽니다: {image.width}x{image.height} > {self.max_image_pixels} 픽셀")
+        
+        target_width, target_height = max(target_size[0], 1), max(target_size[1], 1)
+        if cover:
+            cover_scale = max(target_width / image.width, target_height / image.height)
+            target_width = math.ceil(image.width * cover_scale)
+            target_height = math.ceil(image.height * cover_scale)
+        
+        if image.format == 'JPEG':
+            image.draft(None, (target_width, target_height))
+        
+        factor = int(min(image.width / target_width, image.height / target_height) / self.REDUCING_GAP)
+        if factor >= 2:
+            image = self._reducible(image).reduce(factor)
+        
+        return image
     
     @staticmethod
-    def create_background(width: int, height: int, theme: Theme) -> Image.Image:
-        """테마에 따른 배경 생성"""
-        background = Image.new('RGBA', (width, height), theme.background_color)
+    def _reducible(image: Image.Image) -> Image.Image:
+        """reduce()가 지원하지 않는 모드(팔레트, 1비트, 16비트 정수)를 가까운 모드로 변환"""
+        if image.mode == 'P':
+            return image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        if image.mode == '1':
+            return image.convert('L')
+        if image.mode.startswith('I;16'):
+            return image.convert('I')
+        return image
+    
+    def _prepare_background(self, data: bytes, width: int, height: int, theme: Theme) -> Image.Image:
+        """다운로드한 배경 이미지를 캔버스 크기에 맞게 자르고 오버레이 적용"""
+        bg_image = self.decode_image(data, (width, height), cover=True)
         
-        if theme.background_gradient:
-            draw = ImageDraw.Draw(background)
-            start_color, end_color = theme.gradient_colors
-            
-            for i in range(height):
-                ratio = i / height
-                r = int(start_color[0] * (1 - ratio) + end_color[0] * ratio)
-                g = int(start_color[1] * (1 - ratio) + end_color[1] * ratio)
-                b = int(start_color[2] * (1 - ratio) + end_color[2] * ratio)
-                draw.line([(0, i), (width, i)], fill=(r, g, b, 255))
+        # RGB는 채널이 적은 상태로 리샘플링하고 마지막에 RGBA로 변환 (결과는 동일)
+        if bg_image.mode not in ('RGB', 'RGBA'):
+            bg_image = bg_image.convert('RGBA')
+        
+        bg_width, bg_height = bg_image.size
+        scale = max(width / bg_width, height / bg_height)
         
-        return background
+        new_width = int(bg_width * scale)
+        new_height = int(bg_height * scale)
+        
+        bg_image = bg_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        
+        left = (new_width - width) // 2
+        top = (new_height - height) // 2
+        bg_image = bg_image.crop((left, top, left + width, top + height))
+        
+        if bg_image.mode != 'RGBA':
+            bg_image = bg_image.convert('RGBA')
+        
+        if theme.overlay_opacity > 0:
+            overlay = Image.new('RGBA', (width, height), (0, 0, 0, int(255 * theme.overlay_opacity)))
+            bg_image = Image.alpha_composite(bg_image, overlay)
+        
+        return bg_image
+    
+    def create_background(self, width: int, height: int, theme: Theme,
+                          timer: Optional[StageTimer] = None) -> Image.Image:
+        """테마에 따른 배경 생성 (테마/크기별로 한 번만 만들고 복사본 반환)"""
+        with timed(timer, 'background'):
+            key = ('theme_background', theme.name, width, height)
+            cached = self._cached_image(key)
+            if cached is None:
+                cached = self.render_theme_background(width, height, theme)
+                self._store_image(key, cached)
+            return cached.copy()
     
     @staticmethod
-    def load_profile_image(avatar_url: str) -> Image.Image:
+    def render_theme_background(width: int, height: int, theme: Theme) -> Image.Image:
+        """테마 배경 렌더링 - 그라데이션은 1×H 세로 램프를 만든 뒤 가로로 늘려서 한 번에 생성"""
+        if not theme.background_gradient:
+            return Image.new('RGBA', (width, height), theme.background_color)
+        
+        start_color, end_color = theme.gradient_colors
+        ramp = bytearray()
+        for i in range(height):
+            ratio = i / height
+            r = int(start_color[0] * (1 - ratio) + end_color[0] * ratio)
+            g = int(start_color[1] * (1 - ratio) + end_color[1] * ratio)
+            b = int(start_color[2] * (1 - ratio) + end_color[2] * ratio)
+            ramp += bytes((r, g, b, 255))
+        
+        column = Image.frombytes('RGBA', (1, height), bytes(ramp))
+        return column.resize((width, height), Image.Resampling.NEAREST)
+    
+    def load_profile_image(self, avatar_url: str) -> Image.Image:
         """URL에서 프로필 이미지 로드"""
-        response = requests.get(avatar_url)
-        response.raise_for_status()
-        return Image.open(BytesIO(response.content))
+        return Image.open(BytesIO(self.fetcher.fetch(avatar_url)))
+    
+    def load_circular_profile_image(self, avatar_url: str, diameter: int, theme: Theme,
+                                    border_thickness: int = 15, data: Optional[bytes] = None,
+                                    timer: Optional[StageTimer] = None) -> Image.Image:
+        """URL에서 프로필 이미지를 로드하여 원형으로 가공 (반환된 이미지는 수정하지 말 것)
+        
+        data: 이미 받아둔 이미지 내용 (주어지면 다운로드하지 않음)
+        timer: 다운로드(fetch_avatar)와 가공(avatar_circle) 시간을 기록할 타이머
+        """
+        if data is None:
+            with timed(timer, 'fetch_avatar'):
+                data = self.fetcher.fetch(avatar_url)
+        with timed(timer, 'avatar_circle'):
+            key = ('avatar', self._content_key(data), theme.name, diameter, border_thickness)
+            cached = self._cached_image(key)
+            if cached is not None:
+                return cached
+            
+            circular = self.create_circular_image(self.decode_image(data, (diameter, diameter)), diameter, theme,
+                                                  border_thickness)
+            self._store_image(key, circular)
+            return circular
+    
+    def get_cache_stats(self) -> Dict[str, Dict[str, object]]:
+        """다운로드/가공 이미지 캐시 통계 반환"""
+        return {
+            'http': self.fetcher.get_cache_stats(),
+            'image': self.image_cache.stats() if self.image_cache is not None else {},
+        }
     
     @staticmethod
-    def create_circular_image(image: Image.Image, diameter: int, theme: Theme) -> Image.Image:
-        """테마에 따른 원형 프로필 이미지 생성"""
+    def create_circular_image(image: Image.Image, diameter: int, theme: Theme,
+                              border_thickness: int = 15) -> Image.Image:
+        """테마에 따른 원형 프로필 이미지 생성 (테두리 장식은 border_thickness 15 기준으로 비례 조정)"""
         image = image.resize((diameter, diameter), Image.Resampling.LANCZOS)
         
-        border_thickness = 15
         total_diameter = diameter + (border_thickness * 2)
         result = Image.new('RGBA', (total_diameter, total_diameter), (0, 0, 0, 0))
         
-        mask = Image.new('L', (diameter, diameter), 0)
-        mask_draw = ImageDraw.Draw(mask)
-        mask_draw.ellipse((0, 0, diameter, diameter), fill=255)
-        
-        output = Image.new('RGBA', (diameter, diameter), (0, 0, 0, 0))
-        output.paste(image, (0, 0))
-        output.putalpha(mask)
-        
-        result.paste(output, (border_thickness, border_thickness))
+        # 캔버스에 바로 붙이고 미리 만든 원형 알파로 한 번에 잘라냄
+        result.paste(image, (border_thickness, border_thickness))
+        result.putalpha(ImageProcessor._circular_alpha(diameter, border_thickness))
         
         draw = ImageDraw.Draw(result)
         
         if theme.border_style == 'glow':
             for i in range(5):
+                spread = round(i * 2 * border_thickness / 15)
                 alpha = int(255 * (0.3 - i * 0.05))
                 color = theme.border_color + (alpha,)
-                draw.ellipse((border_thickness - i*2, border_thickness - i*2, 
-                             border_thickness + diameter + i*2, border_thickness + diameter + i*2), 
-                            outline=color, width=border_thickness + i*2)
+                draw.ellipse((border_thickness - spread, border_thickness - spread, 
+                             border_thickness + diameter + spread, border_thickness + diameter + spread), 
+                            outline=color, width=border_thickness + spread)
         
         elif theme.border_style == 'double':
-            draw.ellipse((border_thickness - 5, border_thickness - 5, 
-                         border_thickness + diameter + 5, border_thickness + diameter + 5), 
-                        outline=theme.border_color, width=5)
+            gap = max(1, round(5 * border_thickness / 15))
+            draw.ellipse((border_thickness - gap, border_thickness - gap, 
+                         border_thickness + diameter + gap, border_thickness + diameter + gap), 
+                        outline=theme.border_color, width=gap)
         
         draw.ellipse((border_thickness, border_thickness, 
                      border_thickness + diameter, border_thickness + diameter), 
                     outline=theme.border_color, width=border_thickness)
         
         return result
+    
+    @staticmethod
+    @lru_cache(maxsize=16)
+    def _circular_alpha(diameter: int, border_thickness: int) -> Image.Image:
+        """테두리 여백을 포함한 캔버스 크기의 원형 알파 마스크 (지름별 캐시, 공유되므로 수정하지 말 것)"""
+        total_diameter = diameter + (border_thickness * 2)
+        
+        mask = Image.new('L', (diameter, diameter), 0)
+        mask_draw = ImageDraw.Draw(mask)
+        mask_draw.ellipse((0, 0, diameter, diameter), fill=255)
+        
+        alpha = Image.new('L', (total_diameter, total_diameter), 0)
+        alpha.paste(mask, (border_thickness, border_thickness))
+        return alpha
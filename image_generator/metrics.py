@@ -0,0 +1,197 @@
+import http.server
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# (라벨 dict, 값) 목록을 돌려주는 수집 함수 - 조회할 때마다 호출됨
+Sample = Tuple[Dict[str, str], float]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), chr(92) + "n")}"'
+               for key, value in sorted(labels.items()))
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """라벨별 누적 카운터"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def expose(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for key, value in sorted(values.items()):
+            lines.append(f'{self.name}{_format_labels(dict(key))} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """라벨별 지연 시간 히스토그램 (초 단위)"""
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # {라벨: [버킷별 개수..., 합계, 전체 개수]}
+        self._values: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    values[i] += 1
+            values[-2] += seconds
+            values[-1] += 1
+
+    def expose(self) -> List[str]:
+        with self._lock:
+            snapshot = {key: list(values) for key, values in self._values.items()}
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for key, values in sorted(snapshot.items()):
+            labels = dict(key)
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{_format_labels({**labels, "le": _format_value(bound)})} {count}')
+            lines.append(f'{self.name}_bucket{_format_labels({**labels, "le": "+Inf"})} {values[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {values[-2]!r}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {values[-1]}')
+        return lines
+
+
+class CollectedMetric:
+    """조회 시점에 collect()로 값을 읽어오는 지표 (다른 객체가 이미 세고 있는 통계 노출용)"""
+
+    def __init__(self, name: str, metric_type: str, help_text: str, collect: Callable[[], Iterable[Sample]]):
+        self.name = name
+        self.metric_type = metric_type
+        self.help_text = help_text
+        self.collect = collect
+
+    def expose(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.metric_type}']
+        for labels, value in self.collect():
+            lines.append(f'{self.name}{_format_labels(labels)} {_format_value(value)}')
+        return lines
+
+
+class MetricsRegistry:
+    """프로세스 안의 지표 모음 - Prometheus 텍스트 형식으로 출력"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not isinstance(metric, CollectedMetric):
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))
+
+    def collected(self, name: str, metric_type: str, help_text: str,
+                  collect: Callable[[], Iterable[Sample]]) -> CollectedMetric:
+        """같은 이름으로 다시 등록하면 새 collect로 교체"""
+        return self._register(CollectedMetric(name, metric_type, help_text, collect))
+
+    def expose(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.expose())
+            except Exception as e:
+                lines.append(f'# {metric.name} 수집 실패: {e}')
+        return '\n'.join(lines) + '\n'
+
+
+# 프로세스 전역 지표
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'welcome_stage_seconds', '이미지 생성 단계별 소요 시간 (초)')
+IMAGES = REGISTRY.counter(
+    'welcome_images_total', '이미지 생성 결과 (status: success / error / rejected, error: 예외 종류)')
+
+
+class StageTimer:
+    """요청 하나의 단계별 소요 시간 기록 (같은 단계를 여러 번 재면 합산)"""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - started
+
+
+def timed(timer: Optional[StageTimer], name: str):
+    """timer가 있으면 name 단계로 시간을 재고, 없으면 아무것도 하지 않는 컨텍스트"""
+    return timer.stage(name) if timer is not None else nullcontext()
+
+
+def observe_stages(stage_seconds: Dict[str, float]):
+    """단계별 소요 시간을 STAGE_SECONDS 히스토그램에 기록"""
+    for stage, seconds in stage_seconds.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def start_metrics_server(host: str, port: int, registry: MetricsRegistry = REGISTRY) -> http.server.ThreadingHTTPServer:
+    """GET /metrics로 지표를 내려주는 HTTP 서버를 백그라운드 스레드로 시작"""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.expose().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
@@ -0,0 +1,159 @@
+import cProfile
+import dataclasses
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class RequestProfiler:
+    """요청 단위 cProfile 프로파일러 - 느린 요청의 프로파일과 요청 필드를 디렉토리에 저장
+
+    mode:
+        'off'     - 프로파일링하지 않음 (메타데이터 요청도 무시)
+        'sampled' - sample_rate 비율의 요청과 클라이언트가 요청한 경우만 프로파일링
+        'always'  - 모든 요청 프로파일링
+
+    프로파일링한 요청 중 slow_seconds 이상 걸렸거나 클라이언트가 요청한 것만 저장하며,
+    저장된 파일 전체가 max_bytes를 넘으면 오래된 것부터 지웁니다.
+    한 요청은 '<이름>.prof'(pstats로 열 수 있는 프로파일)와 '<이름>.json'(요청 필드, 소요 시간,
+    상위 함수 요약) 두 파일로 저장됩니다.
+
+    cProfile은 호출한 스레드만 기록하므로, 배경/아바타 다운로드처럼 다른 스레드에서 하는 일은
+    기다린 시간으로만 보입니다.
+    """
+    MODES = ('off', 'sampled', 'always')
+
+    def __init__(self, dump_dir: str, mode: str = 'off', sample_rate: float = 0.01,
+                 slow_seconds: float = 1.0, max_bytes: int = 64 * 1024 * 1024):
+        if mode not in self.MODES:
+            print(f"알 수 없는 프로파일링 모드: {mode}, 'off' 사용")
+            mode = 'off'
+
+        self.dump_dir = dump_dir
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._dumps: "OrderedDict[str, int]" = OrderedDict()  # {저장 이름: 두 파일 크기 합}, 오래된 순
+        self.current_bytes = 0
+
+        if self.enabled:
+            self._load_existing_dumps()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off'
+
+    def _load_existing_dumps(self):
+        """재시작 전에 저장된 파일도 크기 예산에 포함"""
+        os.makedirs(self.dump_dir, exist_ok=True)
+        sizes: Dict[str, int] = {}
+        mtimes: Dict[str, float] = {}
+        for name in os.listdir(self.dump_dir):
+            base, ext = os.path.splitext(name)
+            if ext not in ('.prof', '.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.dump_dir, name))
+            except OSError:
+                continue
+            sizes[base] = sizes.get(base, 0) + stat.st_size
+            mtimes[base] = max(mtimes.get(base, 0.0), stat.st_mtime)
+        for base in sorted(sizes, key=lambda b: mtimes[b]):
+            self._dumps[base] = sizes[base]
+            self.current_bytes += sizes[base]
+
+    def should_profile(self, requested: bool = False) -> bool:
+        """이번 요청을 프로파일링할지 결정 (requested: 클라이언트가 메타데이터로 요청함)"""
+        if self.mode == 'always':
+            return True
+        if self.mode == 'sampled':
+            return requested or random.random() < self.sample_rate
+        return False
+
+    def run(self, render: Callable[[], T], fields: Dict[str, Any], requested: bool = False) -> T:
+        """render()를 실행하고, 프로파일링 대상이면서 느렸거나 요청된 경우 결과를 저장"""
+        if not self.should_profile(requested):
+            return render()
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 다른 프로파일러가 이미 동작 중 (Python 3.12+에서는 동시에 하나만 가능)
+            return render()
+
+        started = time.perf_counter()
+        error: Optional[BaseException] = None
+        try:
+            return render()
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            if requested or elapsed >= self.slow_seconds:
+                try:
+                    self._dump(profiler, fields, elapsed, error)
+                except Exception as e:
+                    print(f"프로파일 저장 실패: {e}")
+
+    def _dump(self, profiler: cProfile.Profile, fields: Dict[str, Any], elapsed: float,
+              error: Optional[BaseException]):
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        base = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{os.getpid()}-{sequence}"
+        prof_path = os.path.join(self.dump_dir, base + '.prof')
+        json_path = os.path.join(self.dump_dir, base + '.json')
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(30)
+
+        profiler.dump_stats(prof_path)
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'elapsed_seconds': elapsed,
+                'error': repr(error) if error is not None else None,
+                'request': {name: self._json_value(value) for name, value in fields.items()},
+                'top_cumulative': summary.getvalue(),
+            }, f, ensure_ascii=False, indent=2)
+
+        size = os.path.getsize(prof_path) + os.path.getsize(json_path)
+        evicted = []
+        with self._lock:
+            self._dumps[base] = size
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and len(self._dumps) > 1:
+                old_base, old_size = self._dumps.popitem(last=False)
+                self.current_bytes -= old_size
+                evicted.append(old_base)
+
+        for old_base in evicted:
+            for ext in ('.prof', '.json'):
+                try:
+                    os.remove(os.path.join(self.dump_dir, old_base + ext))
+                except OSError:
+                    pass
+
+        print(f"요청 프로파일 저장: {json_path} ({elapsed:.3f}초)")
+
+    @staticmethod
+    def _json_value(value: Any) -> Any:
+        if isinstance(value, (bytes, bytearray)):
+            # 미리 받은 이미지 내용은 크기만 기록
+            return f"<{len(value)} bytes>"
+        if dataclasses.is_dataclass(value):
+            return dataclasses.asdict(value)
+        return value
@@ -0,0 +1,196 @@
+import itertools
+import multiprocessing
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from image_encoder import EncodeOptions, EncodedImage
+from metrics import observe_stages
+from welcome_image_generator import WelcomeImageGenerator, default_encode_options
+
+
+class RenderQueueFull(Exception):
+    """렌더링 대기열이 가득 차서 요청을 받을 수 없음"""
+
+
+# 워커 프로세스마다 하나씩 만드는 생성기 (폰트/캐시를 프로세스 안에서 재사용)
+_worker_generator: Optional[WelcomeImageGenerator] = None
+# maxtasksperchild까지 남은 작업 수 (None이면 무제한)와 그 한도로 교체된 워커 수
+_worker_tasks_left: Optional[int] = None
+_worker_retired_count = None
+
+
+def _init_worker(ready_count, retired_count, max_tasks_per_child: int):
+    global _worker_generator, _worker_tasks_left, _worker_retired_count
+    _worker_generator = WelcomeImageGenerator()
+    _worker_tasks_left = max_tasks_per_child or None
+    _worker_retired_count = retired_count
+    with ready_count.get_lock():
+        ready_count.value += 1
+
+
+def _finish_task():
+    """이번 작업으로 maxtasksperchild에 닿으면 정상 교체로 기록 (비정상 종료한 워커와 구분용)"""
+    global _worker_tasks_left
+    if _worker_tasks_left is None:
+        return
+    _worker_tasks_left -= 1
+    if _worker_tasks_left == 0:
+        with _worker_retired_count.get_lock():
+            _worker_retired_count.value += 1
+
+
+def _render(kwargs: dict) -> EncodedImage:
+    try:
+        return _worker_generator.generate_welcome_image(**kwargs)
+    finally:
+        _finish_task()
+
+
+def _render_version() -> str:
+    try:
+        return _worker_generator.render_version()
+    finally:
+        _finish_task()
+
+
+class ProcessRenderPool:
+    """WelcomeImageGenerator를 미리 띄워둔 워커 프로세스들에서 이미지를 생성하는 풀
+
+    렌더링(세그먼트 분할, 그리기, 인코딩)은 대부분 GIL을 잡는 CPU 작업이라 스레드로는
+    코어 하나를 넘기 어렵기 때문에, 요청을 프로세스로 보내 코어 수만큼 병렬로 처리합니다.
+    WelcomeImageGenerator.generate_welcome_image와 같은 인자로 호출할 수 있습니다.
+
+    processes:            워커 프로세스 수
+    max_tasks_per_child:  워커 하나가 처리할 최대 요청 수 (넘으면 새 프로세스로 교체, 0이면 무제한)
+    queue_depth:          실행 중인 요청 외에 대기할 수 있는 요청 수 (넘으면 RenderQueueFull)
+    timeout:              요청 하나의 최대 대기 시간 (초)
+
+    요청의 자리는 호출자가 기다리기를 포기할 때가 아니라 워커가 실제로 끝냈을 때 반환하므로
+    시간 초과된 작업도 끝날 때까지는 대기열을 차지합니다. 다만 워커가 작업 도중 죽으면(OOM,
+    FreeType 세그폴트 등) multiprocessing.Pool은 그 작업의 콜백을 부르지 않으므로, 시작된 워커
+    수에서 처음 워커 수와 maxtasksperchild로 교체된 수를 빼서 비정상 종료한 워커를 셉니다.
+    그 수가 늘어나면 그 전에 제출되었고 호출자가 이미 포기한 작업은 잃어버린 것으로 보고
+    자리를 반환합니다. (죽은 워커에서 돌던 작업만 골라낼 수는 없어서, 같은 시점에 느리게
+    돌던 작업도 함께 반환되어 잠시 대기열이 queue_depth를 넘을 수 있습니다.)
+    """
+
+    def __init__(self, processes: int, max_tasks_per_child: int = 0, queue_depth: int = 64,
+                 timeout: float = 60.0):
+        self.processes = processes
+        self.timeout = timeout
+        self.default_encode_options = default_encode_options()
+
+        # fork는 gRPC 스레드/락 상태까지 복제하므로 spawn 사용
+        context = multiprocessing.get_context('spawn')
+        # 초기화를 마친 워커 수 (교체된 워커도 포함해서 계속 증가)
+        self._ready_count = context.Value('i', 0)
+        # maxtasksperchild에 닿아 정상적으로 교체된 워커 수
+        self._retired_count = context.Value('i', 0)
+        self._pool = context.Pool(processes, initializer=_init_worker,
+                                  initargs=(self._ready_count, self._retired_count, max_tasks_per_child),
+                                  maxtasksperchild=max_tasks_per_child or None)
+        self._slots = threading.BoundedSemaphore(processes + queue_depth)
+        self._render_version: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count()
+        # 자리를 차지하고 있는 작업
+        self._holding: Set[int] = set()
+        # 호출자가 시간 초과로 포기했지만 아직 끝나지 않은 작업 {작업 id: 제출할 때의 비정상 종료 워커 수}
+        self._abandoned: Dict[int, int] = {}
+        # 지금까지 확인된 비정상 종료 워커 수 (교체가 진행 중일 때 잠시 줄어 보이지 않도록 최댓값 유지)
+        self._lost_workers = 0
+        # 잃어버린 것으로 보고 자리를 반환한 작업 수
+        self.lost_tasks = 0
+
+    def warm_up(self):
+        """모든 워커가 생성기 초기화(폰트 로딩)를 마칠 때까지 대기"""
+        deadline = time.monotonic() + self.timeout
+        while self._ready_count.value < self.processes:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"워커 초기화 시간 초과: {self._ready_count.value}/{self.processes}")
+            time.sleep(0.05)
+
+    def render_version(self) -> str:
+        """워커 생성기의 렌더링 구성 해시 (모든 워커가 같은 설정으로 시작하므로 한 번만 조회)"""
+        if self._render_version is None:
+            self._render_version = self._pool.apply_async(_render_version).get(self.timeout)
+        return self._render_version
+    
+    def generate_welcome_image(self, encode_options: Optional[EncodeOptions] = None,
+                               **kwargs) -> EncodedImage:
+        """워커 프로세스에서 환영 이미지 생성"""
+        lost_workers = self._reclaim_lost_tasks()
+        if not self._slots.acquire(blocking=False):
+            raise RenderQueueFull("렌더링 대기열이 가득 찼습니다")
+        kwargs['encode_options'] = encode_options or self.default_encode_options
+        
+        task_id = next(self._task_ids)
+        with self._lock:
+            self._holding.add(task_id)
+        
+        def release(_):
+            self._release(task_id)
+        
+        try:
+            result = self._pool.apply_async(_render, (kwargs,), callback=release, error_callback=release)
+        except BaseException:
+            self._release(task_id)
+            raise
+        try:
+            encoded = result.get(self.timeout)
+        except multiprocessing.TimeoutError:
+            with self._lock:
+                if task_id in self._holding:
+                    self._abandoned[task_id] = lost_workers
+            # 워커가 죽어서 끝나지 않는 작업이면 여기서 자리 반환
+            self._reclaim_lost_tasks()
+            raise
+        # 워커에서 기록한 지표는 워커 프로세스에 남으므로 결과에 담긴 단계별 시간을 여기서 다시 기록
+        observe_stages(encoded.stage_seconds)
+        return encoded
+
+    def _release(self, task_id: int):
+        """작업의 자리 반환 (콜백과 유실 처리 중 먼저 온 쪽만 반환)"""
+        with self._lock:
+            if task_id not in self._holding:
+                return
+            self._holding.discard(task_id)
+            self._abandoned.pop(task_id, None)
+        self._slots.release()
+
+    def _reclaim_lost_tasks(self) -> int:
+        """비정상 종료 워커 수를 갱신하고, 그 전에 제출되어 호출자가 포기한 작업의 자리 반환
+
+        현재까지의 비정상 종료 워커 수를 반환합니다.
+        """
+        lost = self._ready_count.value - self.processes - self._retired_count.value
+        with self._lock:
+            self._lost_workers = max(self._lost_workers, lost)
+            lost = self._lost_workers
+            reclaimed = [task_id for task_id, submitted in self._abandoned.items() if submitted < lost]
+            self.lost_tasks += len(reclaimed)
+        for task_id in reclaimed:
+            self._release(task_id)
+        if reclaimed:
+            print(f"워커 비정상 종료로 끝나지 않는 렌더링 작업 {len(reclaimed)}개의 자리 반환")
+        return lost
+
+    def close(self):
+        """대기 중인 요청을 마치고 워커 종료
+
+        잃어버린 작업이 있으면 Pool.join()이 그 작업을 끝없이 기다리므로, 남은 작업을 timeout까지
+        기다린 뒤 워커를 강제로 종료합니다.
+        """
+        self._pool.close()
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            self._reclaim_lost_tasks()
+            with self._lock:
+                if not self._holding:
+                    break
+            time.sleep(0.05)
+        if self.lost_tasks or self._holding:
+            self._pool.terminate()
+        self._pool.join()
@@ -0,0 +1,230 @@
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from byte_cache import ByteBudgetCache
+from config import config
+from image_encoder import EncodedImage
+
+
+def request_key(kwargs: Dict[str, Any], render_version: str) -> str:
+    """generate_welcome_image 인자와 렌더링 구성 버전으로 만든 안정적인 캐시 키"""
+    canonical = {}
+    for name, value in kwargs.items():
+        if isinstance(value, (bytes, bytearray)):
+            # 미리 받은 이미지 내용은 해시로 대신
+            value = hashlib.blake2b(value, digest_size=16).hexdigest()
+        elif dataclasses.is_dataclass(value):
+            value = dataclasses.asdict(value)
+        canonical[name] = value
+
+    payload = json.dumps([render_version, canonical], sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+
+
+class DiskResultStore:
+    """결과 이미지를 파일로 저장하는 캐시 (전체 크기 예산을 넘으면 오래 안 쓴 파일부터 삭제)
+
+    파일 하나에 MIME 타입 한 줄과 이미지 내용을 저장하고, 수정 시각으로 TTL을 판단합니다.
+    """
+    SUFFIX = '.card'
+
+    def __init__(self, path: str, max_bytes: int, ttl: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()  # {key: 파일 크기}, 오래 안 쓴 순
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(path, exist_ok=True)
+        entries = []
+        for name in os.listdir(path):
+            if name.endswith(self.SUFFIX):
+                try:
+                    stat = os.stat(os.path.join(path, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[:-len(self.SUFFIX)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self.current_bytes += size
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key + self.SUFFIX)
+
+    def get(self, key: str) -> Optional[EncodedImage]:
+        with self._lock:
+            if key not in self._sizes:
+                self.misses += 1
+                return None
+            self._sizes.move_to_end(key)
+
+        try:
+            file_path = self._file(key)
+            if time.time() - os.stat(file_path).st_mtime > self.ttl:
+                self._remove(key)
+                self.misses += 1
+                return None
+            with open(file_path, 'rb') as f:
+                mime_type, _, data = f.read().partition(b'\n')
+        except OSError:
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return EncodedImage(data, mime_type.decode('ascii'))
+
+    def put(self, key: str, image: EncodedImage):
+        content = image.mime_type.encode('ascii') + b'\n' + image.data
+        if len(content) > self.max_bytes:
+            return
+
+        # 다른 프로세스/스레드가 반쯤 쓴 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체
+        file_path = self._file(key)
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, file_path)
+        except OSError as e:
+            print(f"결과 캐시 파일 저장 실패: {e}")
+            return
+
+        evicted = []
+        with self._lock:
+            self.current_bytes -= self._sizes.pop(key, 0)
+            self._sizes[key] = len(content)
+            self.current_bytes += len(content)
+            while self.current_bytes > self.max_bytes:
+                old_key, old_size = self._sizes.popitem(last=False)
+                self.current_bytes -= old_size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self._file(old_key))
+            except OSError:
+                pass
+
+    def _remove(self, key: str):
+        with self._lock:
+            self.current_bytes -= self._sizes.pop(key, 0)
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._sizes),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+class ResultCache:
+    """완성된 환영 이미지 캐시 (메모리 LRU + 선택적 디스크, TTL 적용)
+
+    같은 키의 렌더링이 이미 진행 중이면 새로 렌더링하지 않고 그 결과를 기다립니다.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, disk_path: Optional[str] = None, disk_max_bytes: int = 0):
+        self.ttl = ttl
+        self.memory = ByteBudgetCache(max_bytes, name='result')
+        self.disk = DiskResultStore(disk_path, disk_max_bytes, ttl) if disk_path and disk_max_bytes > 0 else None
+        self._in_flight: Dict[str, Future] = {}
+        self._in_flight_lock = threading.Lock()
+        self.coalesced = 0
+
+    def get(self, key: str) -> Optional[EncodedImage]:
+        """캐시된 결과 반환 (없거나 만료되면 None)"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            expires_at, image = entry
+            if time.monotonic() < expires_at:
+                return image
+
+        if self.disk is not None:
+            image = self.disk.get(key)
+            if image is not None:
+                # 디스크에서 찾은 결과는 메모리에도 올려둠 (남은 TTL은 알 수 없으므로 새로 시작)
+                self._put_memory(key, image)
+                return image
+        return None
+
+    def put(self, key: str, image: EncodedImage):
+        self._put_memory(key, image)
+        if self.disk is not None:
+            self.disk.put(key, image)
+
+    def _put_memory(self, key: str, image: EncodedImage):
+        self.memory.put(key, (time.monotonic() + self.ttl, image), len(image.data))
+
+    def get_or_render(self, key: str, render: Callable[[], EncodedImage]) -> EncodedImage:
+        """캐시된 결과를 반환하거나, 없으면 render()로 만들어 저장 (동시에 들어온 같은 요청은 한 번만 렌더링)"""
+        image = self.get(key)
+        if image is not None:
+            return image
+
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not owner:
+            self.coalesced += 1
+            return future.result()
+
+        try:
+            image = render()
+            # 일시적인 실패로 대체된 결과는 기다리던 요청에만 돌려주고 저장하지 않음
+            if not image.degraded:
+                self.put(key, image)
+            future.set_result(image)
+            return image
+        except BaseException as e:
+            # 기다리던 요청들도 같은 오류로 실패 (실패한 결과는 캐시하지 않음)
+            future.set_exception(e)
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """캐시 통계 반환"""
+        stats = self.memory.stats()
+        stats['coalesced'] = self.coalesced
+        if self.disk is not None:
+            stats['disk'] = self.disk.stats()
+        return stats
+
+
+class CachedRenderer:
+    """generate_welcome_image 앞에 결과 캐시를 두는 래퍼 (WelcomeImageGenerator / ProcessRenderPool 공용)"""
+
+    def __init__(self, renderer, cache: ResultCache):
+        self.renderer = renderer
+        self.cache = cache
+        self.default_encode_options = renderer.default_encode_options
+
+    def generate_welcome_image(self, encode_options=None, **kwargs) -> EncodedImage:
+        # 기본 인코딩 설정과 출력 너비도 키에 들어가도록 미리 채움 (서버 설정이 바뀌면 키도 바뀜)
+        kwargs['encode_options'] = encode_options or self.default_encode_options
+        kwargs['output_width'] = kwargs.get('output_width') or config.output_width
+        key = request_key(kwargs, self.renderer.render_version())
+        return self.cache.get_or_render(key, lambda: self.renderer.generate_welcome_image(**kwargs))
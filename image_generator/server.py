@@ -2,18 +2,28 @@ import grpc
 from concurrent import futures
 import time
 import logging
+import multiprocessing
+import random
 import signal
 import sys
 import threading
-from welcome_image_generator import WelcomeImageGenerator
+from dataclasses import replace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Union
+from welcome_image_generator import WelcomeImageGenerator, create_http_fetcher
+from render_pool import ProcessRenderPool
+from result_cache import CachedRenderer, ResultCache
+from metrics import IMAGES, REGISTRY, start_metrics_server
+from profiling import RequestProfiler
 from config import config
 
 # 프로토 파일 컴파일 확인
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from proto_compiler import ProtoCompiler
-compiler = ProtoCompiler()
-compiler.compile_protos()
+# 'process' 렌더링 모드의 워커(spawn)도 이 모듈을 다시 import하므로 컴파일은 메인 프로세스에서만
+if multiprocessing.parent_process() is None:
+    compiler = ProtoCompiler()
+    compiler.compile_protos()
 
 # 생성된 proto 파일들을 import
 try:
@@ -26,69 +36,368 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class SharedFetches:
+    """배치 안에서 동시에 진행 중인 이미지들이 같은 URL을 한 번만 받도록 다운로드 future를 공유
+    
+    URL마다 사용 중인 이미지 수를 세고, 아무도 쓰지 않게 되면 받은 내용을 놓습니다.
+    (나중에 같은 URL이 다시 필요하면 다운로더의 응답 캐시를 거쳐 다시 가져옴)
+    submit(url)은 다운로드 future를 반환해야 합니다 (concurrent.futures / asyncio 모두 가능).
+    """
+    
+    def __init__(self, submit: Callable[[str], Any]):
+        self._submit = submit
+        self._lock = threading.Lock()
+        self._entries: Dict[str, list] = {}  # {url: [future, 사용 중인 이미지 수]}
+    
+    def acquire(self, urls: Iterable[str]) -> Dict[str, Any]:
+        """URL별 다운로드 future 반환 (진행 중이거나 받아둔 것이 있으면 공유)"""
+        acquired = {}
+        with self._lock:
+            for url in urls:
+                entry = self._entries.get(url)
+                if entry is None:
+                    entry = self._entries[url] = [self._submit(url), 0]
+                entry[1] += 1
+                acquired[url] = entry[0]
+        return acquired
+    
+    def release(self, urls: Iterable[str]):
+        """acquire한 URL 사용을 마침"""
+        with self._lock:
+            for url in urls:
+                entry = self._entries.get(url)
+                if entry is not None:
+                    entry[1] -= 1
+                    if entry[1] <= 0:
+                        del self._entries[url]
+
+
 class WelcomeImageServiceServicer(welcome_image_service_pb2_grpc.WelcomeImageServiceServicer):
     def __init__(self):
-        self.image_generator = WelcomeImageGenerator()
+        # 'process' 모드면 워커 프로세스 풀, 아니면 요청 스레드에서 직접 생성
+        # (둘 다 generate_welcome_image / default_encode_options를 제공)
+        self.render_pool = None
+        if config.render_mode == 'process':
+            self.render_pool = ProcessRenderPool(
+                processes=config.render_processes,
+                max_tasks_per_child=config.render_max_tasks_per_child,
+                queue_depth=config.render_queue_depth,
+                timeout=config.render_timeout
+            )
+            self.render_pool.warm_up()
+            logger.info(f"렌더링 워커 프로세스 {config.render_processes}개 준비 완료")
+            self.image_generator = self.render_pool
+            self.fetcher = create_http_fetcher()
+        else:
+            self.image_generator = WelcomeImageGenerator()
+            # 생성기와 같은 다운로더를 써서 미리 받은 이미지도 응답 캐시/커넥션 풀을 공유
+            self.fetcher = self.image_generator.image_processor.fetcher
+        
+        # 완성된 이미지 캐시 (같은 요청은 다시 렌더링하지 않음)
+        self.result_cache = None
+        if config.result_cache_bytes > 0:
+            self.result_cache = ResultCache(
+                max_bytes=config.result_cache_bytes,
+                ttl=config.result_cache_ttl,
+                disk_path=config.result_cache_dir or None,
+                disk_max_bytes=config.result_cache_disk_bytes
+            )
+            self.image_generator = CachedRenderer(self.image_generator, self.result_cache)
+        # 배치 요청의 아바타/배경을 미리 받아두는 스레드 풀
+        self.fetch_executor = futures.ThreadPoolExecutor(max_workers=config.fetch_workers,
+                                                         thread_name_prefix='prefetch')
+        # 느린 요청 프로파일링 ('process' 모드에서는 렌더링이 워커에서 일어나므로 요청 필드와 소요 시간 위주)
+        self.profiler = RequestProfiler(
+            config.profile_dir,
+            mode=config.profile_mode,
+            sample_rate=config.profile_sample_rate,
+            slow_seconds=config.profile_slow_seconds,
+            max_bytes=config.profile_max_bytes
+        )
+        self._register_metrics()
         logger.info("WelcomeImageService 초기화 완료")
     
+    def _register_metrics(self):
+        """캐시/폰트 통계를 /metrics에서 조회할 수 있도록 등록
+        
+        'process' 모드에서는 폰트와 가공 이미지 캐시가 워커 프로세스에 있으므로
+        이 프로세스에서 쓰는 다운로더와 결과 캐시 통계만 노출합니다.
+        """
+        caches = {'prefetch_http' if self.render_pool is not None else 'http': self.fetcher.get_cache_stats}
+        if self.render_pool is None:
+            image_cache = self._thread_generator().image_processor.image_cache
+            if image_cache is not None:
+                caches['image'] = image_cache.stats
+            caches['text_segment'] = self._thread_generator().text_renderer.get_segment_cache_stats
+            caches['text_measure'] = self._thread_generator().text_renderer.get_measure_cache_stats
+        if self.result_cache is not None:
+            caches['result'] = self.result_cache.memory.stats
+            if self.result_cache.disk is not None:
+                caches['result_disk'] = self.result_cache.disk.stats
+        
+        def cache_lookups():
+            for name, stats in caches.items():
+                values = stats()
+                if not values:  # 캐시를 끈 경우
+                    continue
+                yield {'cache': name, 'result': 'hit'}, values['hits']
+                yield {'cache': name, 'result': 'miss'}, values['misses']
+        
+        REGISTRY.collected('welcome_cache_lookups_total', 'counter', '캐시 조회 결과 (result: hit / miss)',
+                           cache_lookups)
+        
+        if self.render_pool is None:
+            font_manager = self._thread_generator().font_manager
+            
+            def font_cache_lookups():
+                stats = font_manager.get_font_cache_stats()
+                yield {'result': 'hit'}, stats['hits']
+                yield {'result': 'miss'}, stats['misses']
+            
+            def font_chars():
+                # font='unsupported'는 어떤 폰트로도 그릴 수 없었던 문자
+                for font_name, count in sorted(font_manager.usage_stats.snapshot().items()):
+                    yield {'font': font_name}, count
+            
+            REGISTRY.collected('welcome_font_cache_lookups_total', 'counter',
+                               '크기별 폰트 객체 캐시 조회 결과 (result: hit / miss)', font_cache_lookups)
+            REGISTRY.collected('welcome_font_chars_total', 'counter',
+                               '폰트별로 그린 문자 수 (기본 폰트 외의 값은 대체 폰트 사용량)', font_chars)
+    
+    def _thread_generator(self) -> WelcomeImageGenerator:
+        """결과 캐시 래퍼를 벗긴 'thread' 모드 생성기"""
+        generator = self.image_generator
+        return generator.renderer if isinstance(generator, CachedRenderer) else generator
+    
+    def close(self):
+        """렌더링 워커 정리"""
+        self.fetch_executor.shutdown(wait=False)
+        if self.render_pool is not None:
+            self.render_pool.close()
+            self.fetcher.close()
+    
     def GenerateWelcomeImage(self, request, context):
         try:
             logger.info(f"이미지 생성 요청 받음: {request.title_text} (테마: {request.theme})")
             
-            # 테마 매핑
-            theme_map = {
-                welcome_image_service_pb2.THEME_DEFAULT: 'default',
-                welcome_image_service_pb2.THEME_MINIMAL: 'minimal',
-                welcome_image_service_pb2.THEME_GRADIENT: 'gradient',
-                welcome_image_service_pb2.THEME_DARK: 'dark',
-                welcome_image_service_pb2.THEME_COLORFUL: 'colorful',
-                welcome_image_service_pb2.THEME_GAMING: 'gaming',
-                welcome_image_service_pb2.THEME_CUTE: 'cute',
-            }
-            
-            theme_name = theme_map.get(request.theme, 'default')
-            
             # 이미지 생성
-            image_data = self.image_generator.generate_welcome_image(
-                title_text=request.title_text,
-                subtitle_text=request.subtitle_text,
-                avatar_url=request.avatar_url,
-                bg_url=request.bg_url if request.bg_url else None,
-                header_text=request.header_text,
-                footer_text=request.footer_text,
-                strikeout=request.strikeout,
-                username_color_hex=request.username_color_hex,
-                suffix_text=request.suffix_text,
-                theme_name=theme_name
-            )
-            
-            logger.info(f"이미지 생성 성공: {len(image_data)} bytes")
-            
-            return welcome_image_service_pb2.GenerateWelcomeImageResponse(
-                image_data=image_data,
-                success=True,
-                error_message=""
-            )
+            encoded = self._generate(self._generate_kwargs(request), self._profile_requested(context))
+            return self._success_response(encoded)
             
         except Exception as e:
-            logger.error(f"이미지 생성 실패: {str(e)}", exc_info=True)
-            return welcome_image_service_pb2.GenerateWelcomeImageResponse(
-                image_data=b"",
-                success=False,
-                error_message=str(e)
-            )
+            return self._error_response(e)
+    
+    def GenerateWelcomeImages(self, request, context):
+        """여러 장을 한 번에 생성하여 끝나는 순서대로 스트리밍
+        
+        같은 요청은 한 번만 렌더링하고, 각 이미지는 자기 아바타/배경을 받는 즉시 렌더링합니다.
+        동시에 진행하는 이미지는 config.batch_window개로 제한하며, 그 안에서 같은 URL은 한 번만 받습니다.
+        """
+        if len(request.requests) > config.batch_max_size:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                          f"배치 크기 초과: {len(request.requests)} > {config.batch_max_size}")
+        
+        groups = self._group_duplicates(request.requests)
+        logger.info(f"배치 이미지 생성 요청 받음: {len(request.requests)}개 (중복 제외 {len(groups)}개)")
+        
+        fetches = SharedFetches(lambda url: self.fetch_executor.submit(self.fetcher.fetch, url))
+        render_slots = threading.BoundedSemaphore(config.max_concurrent_renders)
+        profiled = self._profiled_group(groups, context)
+        
+        with futures.ThreadPoolExecutor(max_workers=config.batch_window,
+                                        thread_name_prefix='batch-render') as executor:
+            pending = {
+                executor.submit(self._render_batch_item, request.requests[indices[0]], fetches, render_slots,
+                                key == profiled): indices
+                for key, indices in groups.items()
+            }
+            try:
+                for future in futures.as_completed(pending):
+                    response = future.result()
+                    for index in pending[future]:
+                        yield welcome_image_service_pb2.GenerateWelcomeImagesResponse(index=index, result=response)
+            finally:
+                # 클라이언트가 스트림을 끊으면 아직 시작하지 않은 렌더링은 취소
+                for future in pending:
+                    future.cancel()
+    
+    def _render_batch_item(self, request, fetches: "SharedFetches", render_slots: threading.BoundedSemaphore,
+                           profile_requested: bool = False):
+        """배치 안의 이미지 하나 - 자기 URL을 받는 대로 렌더링 (받은 내용은 끝나면 바로 놓음)"""
+        urls = self._request_urls([request])
+        pending = fetches.acquire(urls)
+        try:
+            fetched = {}
+            for url, future in pending.items():
+                try:
+                    fetched[url] = future.result()
+                except Exception as e:
+                    fetched[url] = e
+            with render_slots:
+                return self._render_prefetched(request, fetched, profile_requested)
+        finally:
+            fetches.release(urls)
+    
+    def _render_prefetched(self, request, fetched: Dict[str, Union[bytes, Exception]],
+                           profile_requested: bool = False):
+        """미리 받아둔 이미지로 요청 하나를 렌더링하여 응답 메시지 반환"""
+        try:
+            kwargs = self._generate_kwargs(request)
+            self._apply_prefetched(kwargs, fetched)
+            return self._success_response(self._generate(kwargs, profile_requested))
+        except Exception as e:
+            return self._error_response(e)
+    
+    def _generate(self, kwargs: dict, profile_requested: bool = False):
+        """이미지 생성 (프로파일링 대상이면 프로파일러 안에서 실행)"""
+        return self.profiler.run(lambda: self.image_generator.generate_welcome_image(**kwargs), kwargs,
+                                 profile_requested)
+    
+    @staticmethod
+    def _profile_requested(context) -> bool:
+        """클라이언트가 메타데이터로 이 요청의 프로파일링을 요청했는지 확인"""
+        for key, value in context.invocation_metadata() or ():
+            if key == config.profile_metadata_key:
+                return str(value).lower() in ('1', 'true')
+        return False
+    
+    @classmethod
+    def _profiled_group(cls, groups: Dict[bytes, List[int]], context) -> Optional[bytes]:
+        """배치에 프로파일링이 요청되었으면 그중 한 장만 골라 그 묶음의 키 반환 (모든 장을 프로파일링하지 않음)"""
+        if not groups or not cls._profile_requested(context):
+            return None
+        return random.choice(list(groups))
+    
+    @staticmethod
+    def _group_duplicates(requests) -> Dict[bytes, List[int]]:
+        """내용이 같은 요청끼리 묶음 {직렬화된 요청: [인덱스...]}"""
+        groups: Dict[bytes, List[int]] = {}
+        for index, item in enumerate(requests):
+            groups.setdefault(item.SerializeToString(deterministic=True), []).append(index)
+        return groups
+    
+    @staticmethod
+    def _request_urls(requests: Iterable) -> Set[str]:
+        """요청들이 사용하는 아바타/배경 URL (중복 제거)"""
+        urls = set()
+        for item in requests:
+            if item.avatar_url:
+                urls.add(item.avatar_url)
+            if item.bg_url:
+                urls.add(item.bg_url)
+        return urls
+    
+    @staticmethod
+    def _apply_prefetched(kwargs: dict, fetched: Dict[str, Union[bytes, Exception]]):
+        """미리 받은 이미지를 generate_welcome_image 인자에 넣음
+        
+        배경을 받지 못했으면 단일 요청과 마찬가지로 테마 배경을 쓰고, 아바타를 받지 못했으면 실패합니다.
+        """
+        bg_data = fetched.get(kwargs['bg_url']) if kwargs['bg_url'] else None
+        if isinstance(bg_data, Exception):
+            print(f"배경 이미지 로드 실패: {bg_data}, 기본 배경 사용")
+            kwargs['bg_url'] = None
+        elif bg_data is not None:
+            kwargs['bg_data'] = bg_data
+        
+        avatar_data = fetched.get(kwargs['avatar_url'])
+        if isinstance(avatar_data, Exception):
+            raise avatar_data
+        kwargs['avatar_data'] = avatar_data
+    
+    def _generate_kwargs(self, request) -> dict:
+        """요청 메시지를 generate_welcome_image 인자로 변환"""
+        # 테마 매핑
+        theme_map = {
+            welcome_image_service_pb2.THEME_DEFAULT: 'default',
+            welcome_image_service_pb2.THEME_MINIMAL: 'minimal',
+            welcome_image_service_pb2.THEME_GRADIENT: 'gradient',
+            welcome_image_service_pb2.THEME_DARK: 'dark',
+            welcome_image_service_pb2.THEME_COLORFUL: 'colorful',
+            welcome_image_service_pb2.THEME_GAMING: 'gaming',
+            welcome_image_service_pb2.THEME_CUTE: 'cute',
+        }
+        
+        theme_name = theme_map.get(request.theme, 'default')
+        
+        return dict(
+            title_text=request.title_text,
+            subtitle_text=request.subtitle_text,
+            avatar_url=request.avatar_url,
+            bg_url=request.bg_url if request.bg_url else None,
+            header_text=request.header_text,
+            footer_text=request.footer_text,
+            strikeout=request.strikeout,
+            username_color_hex=request.username_color_hex,
+            suffix_text=request.suffix_text,
+            theme_name=theme_name,
+            encode_options=self._encode_options(request),
+            output_width=request.output_width or None
+        )
+    
+    @staticmethod
+    def _success_response(encoded):
+        logger.info(f"이미지 생성 성공: {len(encoded.data)} bytes ({encoded.mime_type})")
+        IMAGES.inc(status='success')
+        
+        return welcome_image_service_pb2.GenerateWelcomeImageResponse(
+            image_data=encoded.data,
+            success=True,
+            error_message="",
+            mime_type=encoded.mime_type
+        )
+    
+    @staticmethod
+    def _error_response(error: Exception):
+        logger.error(f"이미지 생성 실패: {str(error)}", exc_info=error)
+        IMAGES.inc(status='error', error=type(error).__name__)
+        return welcome_image_service_pb2.GenerateWelcomeImageResponse(
+            image_data=b"",
+            success=False,
+            error_message=str(error)
+        )
+
+    def _encode_options(self, request):
+        """요청의 출력 형식 필드를 서버 기본 인코딩 설정에 덮어씀"""
+        format_map = {
+            welcome_image_service_pb2.OUTPUT_PNG: 'png',
+            welcome_image_service_pb2.OUTPUT_WEBP: 'webp',
+            welcome_image_service_pb2.OUTPUT_JPEG: 'jpeg',
+        }
+        
+        overrides = {}
+        if request.output_format in format_map:
+            overrides['format'] = format_map[request.output_format]
+        if request.HasField('quality'):
+            overrides['quality'] = request.quality
+        if request.HasField('lossless'):
+            overrides['lossless'] = request.lossless
+        if request.HasField('compress_level'):
+            overrides['compress_level'] = request.compress_level
+        
+        return replace(self.image_generator.default_encode_options, **overrides)
 
 def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    welcome_image_service_pb2_grpc.add_WelcomeImageServiceServicer_to_server(
-        WelcomeImageServiceServicer(), server
-    )
+    servicer = WelcomeImageServiceServicer()
+    
+    max_workers = config.grpc_max_workers
+    if config.render_mode == 'process':
+        # 요청 스레드는 워커 결과를 기다리기만 하므로 워커 수 + 대기열만큼은 있어야 대기열이 의미가 있음
+        max_workers = max(max_workers, config.render_processes + config.render_queue_depth)
+    
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    welcome_image_service_pb2_grpc.add_WelcomeImageServiceServicer_to_server(servicer, server)
     
     # 설정에서 포트 가져오기
     server.add_insecure_port(f'[::]:{config.grpc_port}')
     server.start()
     logger.info(f"gRPC 서버가 포트 {config.grpc_port}에서 시작되었습니다.")
     
+    metrics_server = None
+    if config.metrics_port:
+        metrics_server = start_metrics_server(config.metrics_host, config.metrics_port)
+        logger.info(f"지표 서버가 포트 {config.metrics_port}에서 시작되었습니다 (GET /metrics).")
+    
     # Graceful shutdown을 위한 이벤트
     shutdown_event = threading.Event()
     
@@ -107,7 +416,10 @@ def serve():
         logger.info("KeyboardInterrupt 수신")
     finally:
         logger.info("서버 종료 중...")
-        server.stop(grace=5)  # 5초 grace period
+        server.stop(grace=5).wait()  # 5초 grace period
+        servicer.close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
         logger.info("서버가 종료되었습니다.")
 
 if __name__ == '__main__':
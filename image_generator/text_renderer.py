@@ -1,23 +1,56 @@
+import threading
 import unicodedata
-from typing import Tuple, List, Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Tuple, List, Optional
 from PIL import ImageDraw, ImageFont
 from font_manager import FontManager
 from character_adjustment import CharacterAdjustmentRules, CharacterAdjustment
 from theme import Theme
+from font_usage import FontUsage
 import grapheme
 
 class TextSegment:
     """텍스트 세그먼트 - 동일한 폰트로 렌더링할 수 있는 텍스트 덩어리"""
-    def __init__(self, text: str, font: ImageFont.FreeTypeFont, is_fallback: bool = False, adjustment: Optional[CharacterAdjustment] = None):
+    def __init__(self, text: str, font: ImageFont.FreeTypeFont, is_fallback: bool = False, adjustment: Optional[CharacterAdjustment] = None,
+                 font_name: Optional[str] = None):
         self.text = text
         self.font = font
         self.is_fallback = is_fallback
         self.adjustment = adjustment or CharacterAdjustment()
+        # 문자를 지원하는 폰트 이름 (어떤 폰트도 지원하지 않아 기본 폰트를 쓰면 None)
+        self.font_name = font_name
+
+@dataclass
+class TextLayout:
+    """측정이 끝난 텍스트 배치 - 세그먼트별 너비와 참조 폰트 대비 베이스라인 보정값"""
+    segments: List[TextSegment]
+    widths: List[int]
+    baseline_offsets: List[int]
+    width: int
+
+# 크기와 무관한 세그먼트 분할 결과 (텍스트, 폰트 이름, 폴백 여부, 조정 규칙)
+SegmentPlan = Tuple[str, Optional[str], bool, Optional[CharacterAdjustment]]
 
 class TextRenderer:
-    def __init__(self, font_manager: FontManager):
+    def __init__(self, font_manager: FontManager, segment_cache_size: int = 4096, measure_cache_size: int = 16384):
         self.font_manager = font_manager
         self.adjustment_rules = CharacterAdjustmentRules()
+        
+        # 텍스트별 세그먼트 분할 결과 캐시 (LRU) - {(text, preferred_font_name, 폰트 구성, 조정 규칙 버전): [SegmentPlan]}
+        # 정규화·그래핌 분할·폰트 선택은 크기와 무관하므로 한 번만 하고, 크기별 폰트 객체만 새로 가져옴
+        self.segment_cache_size = segment_cache_size
+        self._segment_cache: "OrderedDict[tuple, List[SegmentPlan]]" = OrderedDict()
+        self._segment_cache_lock = threading.Lock()
+        self.segment_cache_hits = 0
+        self.segment_cache_misses = 0
+        
+        # 폰트별 텍스트 측정(getbbox) 결과 캐시 (LRU) - {(폰트 경로, 인덱스, 크기, 레이아웃 엔진, text): bbox}
+        self.measure_cache_size = measure_cache_size
+        self._measure_cache: "OrderedDict[tuple, Tuple[int, int, int, int]]" = OrderedDict()
+        self._measure_cache_lock = threading.Lock()
+        self.measure_cache_hits = 0
+        self.measure_cache_misses = 0
     
     def normalize_text(self, text: str) -> str:
         """텍스트 정규화 및 제어 문자 처리"""
@@ -47,10 +80,65 @@ class TextRenderer:
         return ''.join(cleaned)
     
     def segment_text_by_font_support(self, text: str, font_size: int, preferred_font_name: str = None) -> List[TextSegment]:
-        """텍스트를 폰트 지원 여부에 따라 세그먼트로 분할"""
+        """텍스트를 폰트 지원 여부에 따라 세그먼트로 분할 (같은 텍스트의 분할 결과는 크기에 관계없이 재사용)"""
         if not text:
             return []
+        if self.segment_cache_size <= 0:
+            return self._segment_text(text, font_size, preferred_font_name)
+        
+        key = (text, preferred_font_name, self.font_manager.configuration_fingerprint(),
+               self.adjustment_rules.version)
+        with self._segment_cache_lock:
+            plans = self._segment_cache.get(key)
+            if plans is not None:
+                self._segment_cache.move_to_end(key)
+                self.segment_cache_hits += 1
+            else:
+                self.segment_cache_misses += 1
+        
+        if plans is None:
+            segments = self._segment_text(text, font_size, preferred_font_name)
+            plans = [(segment.text, segment.font_name, segment.is_fallback, segment.adjustment)
+                     for segment in segments]
+            with self._segment_cache_lock:
+                self._segment_cache[key] = plans
+                while len(self._segment_cache) > self.segment_cache_size:
+                    self._segment_cache.popitem(last=False)
+            return segments
         
+        segments = []
+        for segment_text, font_name, is_fallback, adjustment in plans:
+            adjusted_font_size = adjustment.apply_to_size(font_size) if adjustment else font_size
+            if font_name is None:
+                font = self.font_manager.get_font(adjusted_font_size)
+            else:
+                try:
+                    font = self.font_manager.load_font(font_name, adjusted_font_size)
+                except Exception:
+                    # 이 크기에서만 폰트 로드에 실패하면 캐시 없이 다시 분할 (다른 폰트로 폴백)
+                    return self._segment_text(text, font_size, preferred_font_name)
+            segments.append(TextSegment(segment_text, font, is_fallback, adjustment, font_name))
+        return segments
+    
+    def clear_segment_cache(self):
+        """세그먼트 분할 결과 캐시 초기화"""
+        with self._segment_cache_lock:
+            self._segment_cache.clear()
+            self.segment_cache_hits = 0
+            self.segment_cache_misses = 0
+    
+    def get_segment_cache_stats(self) -> Dict[str, int]:
+        """세그먼트 분할 결과 캐시 통계 반환"""
+        with self._segment_cache_lock:
+            return {
+                'size': len(self._segment_cache),
+                'max_size': self.segment_cache_size,
+                'hits': self.segment_cache_hits,
+                'misses': self.segment_cache_misses,
+            }
+    
+    def _segment_text(self, text: str, font_size: int, preferred_font_name: str = None) -> List[TextSegment]:
+        """텍스트 정규화, 그래핌 분할, 폰트 선택을 거쳐 세그먼트 생성 (캐시 미사용)"""
         text = self.normalize_text(text)
         segments = []
         
@@ -70,12 +158,7 @@ class TextRenderer:
                 # 선호 폰트가 모든 문자를 지원하는지 확인
                 if all(self.font_manager.font_supports_character(preferred_font_name, char) for char in cluster):
                     try:
-                        path_info = self.font_manager.available_fonts[preferred_font_name]
-                        if isinstance(path_info, tuple):
-                            font_path, font_index = path_info
-                            current_font = ImageFont.truetype(font_path, adjusted_font_size, index=font_index, layout_engine=ImageFont.Layout.RAQM)
-                        else:
-                            current_font = ImageFont.truetype(path_info, adjusted_font_size, layout_engine=ImageFont.Layout.RAQM)
+                        current_font = self.font_manager.load_font(preferred_font_name, adjusted_font_size)
                         current_font_name = preferred_font_name
                         is_fallback = False
                     except:
@@ -90,27 +173,21 @@ class TextRenderer:
             
             # 선호 폰트가 없거나 지원하지 않으면 폴백
             if not current_font:
-                # 우선순위에 따라 폰트 찾기
-                for font_name in self.font_manager.font_priority:
-                    if font_name in self.font_manager.available_fonts:
-                        if all(self.font_manager.font_supports_character(font_name, char) for char in cluster):
-                            try:
-                                path_info = self.font_manager.available_fonts[font_name]
-                                if isinstance(path_info, tuple):
-                                    font_path, font_index = path_info
-                                    current_font = ImageFont.truetype(font_path, adjusted_font_size, index=font_index, layout_engine=ImageFont.Layout.RAQM)
-                                else:
-                                    current_font = ImageFont.truetype(path_info, adjusted_font_size, layout_engine=ImageFont.Layout.RAQM)
-                                current_font_name = font_name
-                                is_fallback = True
-                                break
-                            except:
-                                continue
+                # 우선순위에 따라 폰트 찾기 (코드포인트 인덱스 사용)
+                font_name = self.font_manager.find_font_for_cluster(cluster)
+                while font_name:
+                    try:
+                        current_font = self.font_manager.load_font(font_name, adjusted_font_size)
+                        current_font_name = font_name
+                        is_fallback = True
+                        break
+                    except:
+                        font_name = self.font_manager.find_font_for_cluster(cluster, after=font_name)
             
             if not current_font:
                 # 폴백도 실패하면 기본 폰트 사용
                 current_font = self.font_manager.get_font(adjusted_font_size)
-                current_font_name = 'default'
+                current_font_name = None
                 is_fallback = True
             
             # 같은 폰트와 같은 조정 규칙을 사용할 수 있는 연속된 클러스터들을 묶기
@@ -130,42 +207,71 @@ class TextRenderer:
                      adjustment.offset_y == next_adjustment.offset_y)
                 )
                 
-                if current_font_name and same_adjustment and all(self.font_manager.font_supports_character(current_font_name, char) for char in next_cluster):
+                if current_font_name and same_adjustment and self.font_manager.font_covers(current_font_name, next_cluster):
                     segment_text += next_cluster
                     j += 1
                 else:
                     break
             
-            segments.append(TextSegment(segment_text, current_font, is_fallback, adjustment))
+            segments.append(TextSegment(segment_text, current_font, is_fallback, adjustment, current_font_name))
             i = j
         
         return segments
     
+    def layout_mixed_text(self, text: str, font_size: int, preferred_font_name: str = None,
+                          segments: Optional[List[TextSegment]] = None) -> TextLayout:
+        """혼합된 유니코드 텍스트의 세그먼트별 너비와 베이스라인 보정값 계산 (그리지 않음)"""
+        if not text:
+            return TextLayout([], [], [], 0)
+        
+        if segments is None:
+            segments = self.segment_text_by_font_support(text, font_size, preferred_font_name)
+        
+        # 베이스라인 계산을 위한 참조 폰트
+        ref_baseline = self.measure_text(self.font_manager.get_font(font_size), "Ay")[3]
+        
+        widths = []
+        baseline_offsets = []
+        for segment in segments:
+            if segment.text:
+                bbox = self.measure_text(segment.font, segment.text)
+                widths.append(bbox[2] - bbox[0])
+                baseline_offsets.append(ref_baseline - self.measure_text(segment.font, "Ay")[3])
+            else:
+                widths.append(0)
+                baseline_offsets.append(0)
+        
+        return TextLayout(segments, widths, baseline_offsets, sum(widths))
+    
     def render_mixed_text(self, draw: ImageDraw, text: str, x: int, y: int, 
                          default_color: Tuple[int, int, int], font_size: int, 
                          shadow: bool = False, shadow_offset: int = 2,
-                         preferred_font_name: str = None) -> int:
-        """혼합된 유니코드 텍스트 렌더링 - 세그먼트 기반"""
+                         preferred_font_name: str = None,
+                         segments: Optional[List[TextSegment]] = None,
+                         usage: Optional[FontUsage] = None,
+                         layout: Optional[TextLayout] = None) -> TextLayout:
+        """혼합된 유니코드 텍스트 렌더링 - 세그먼트 기반 (측정 단계에서 만든 세그먼트/레이아웃 재사용 가능)
+        
+        usage가 주어지면 렌더링된 문자별 사용 폰트를 요청 단위로 기록합니다.
+        사용한 레이아웃을 반환하므로 그린 너비는 반환값의 width로 확인합니다.
+        """
+        if layout is None:
+            layout = self.layout_mixed_text(text, font_size, preferred_font_name, segments)
         if not text:
-            return 0
+            return layout
         
-        segments = self.segment_text_by_font_support(text, font_size, preferred_font_name)
         current_x = x
         
-        # 베이스라인 계산을 위한 참조 폰트
-        ref_font = self.font_manager.get_font(font_size)
-        ref_bbox = ref_font.getbbox("Ay")
-        ref_baseline = ref_bbox[3]
-        
-        for segment in segments:
+        for segment, segment_width, baseline_diff in zip(layout.segments, layout.widths, layout.baseline_offsets):
             if segment.text:
+                if usage is not None:
+                    usage.record(segment.text, segment.font_name)
+                self.font_manager.usage_stats.add(segment.font_name or 'unsupported', len(segment.text))
+                
                 # 조정된 위치 계산
                 adjusted_x, adjusted_y = segment.adjustment.apply_to_position(current_x, y, font_size)
                 
                 # 세그먼트의 베이스라인 조정
-                seg_bbox = segment.font.getbbox("Ay")
-                seg_baseline = seg_bbox[3]
-                baseline_diff = ref_baseline - seg_baseline
                 final_y = adjusted_y + baseline_diff
                 
                 # 세그먼트 전체를 한 번에 렌더링
@@ -177,12 +283,9 @@ class TextRenderer:
                 color = default_color if not segment.is_fallback else default_color
                 draw.text((adjusted_x, final_y), segment.text, fill=color, font=segment.font)
                 
-                # 세그먼트 너비 계산
-                bbox = segment.font.getbbox(segment.text)
-                segment_width = bbox[2] - bbox[0]
                 current_x += segment_width
         
-        return current_x - x
+        return layout
     
     def get_mixed_text_width(self, text: str, font_size: int, preferred_font_name: str = None) -> int:
         """혼합된 유니코드 텍스트의 너비 계산 - 세그먼트 기반"""
@@ -190,16 +293,50 @@ class TextRenderer:
             return 0
         
         segments = self.segment_text_by_font_support(text, font_size, preferred_font_name)
+        return self.get_segments_width(segments)
+    
+    def get_segments_width(self, segments: List[TextSegment]) -> int:
+        """이미 분할된 세그먼트들의 전체 너비 계산"""
         total_width = 0
         
         for segment in segments:
             if segment.text:
-                bbox = segment.font.getbbox(segment.text)
+                bbox = self.measure_text(segment.font, segment.text)
                 total_width += bbox[2] - bbox[0]
         
         return total_width
     
     def get_text_bottom_offset(self, font: ImageFont.FreeTypeFont, text: str = "Ay") -> int:
         """텍스트의 하단 오프셋 계산"""
+        return self.measure_text(font, text)[3]
+    
+    def measure_text(self, font: ImageFont.FreeTypeFont, text: str) -> Tuple[int, int, int, int]:
+        """font.getbbox(text) 결과를 캐시를 거쳐 반환 (같은 폰트 파일·크기·문자열이면 재사용)"""
+        if self.measure_cache_size <= 0:
+            return font.getbbox(text)
+        
+        key = (font.path, font.index, font.size, font.layout_engine, text)
+        with self._measure_cache_lock:
+            bbox = self._measure_cache.get(key)
+            if bbox is not None:
+                self._measure_cache.move_to_end(key)
+                self.measure_cache_hits += 1
+                return bbox
+            self.measure_cache_misses += 1
+        
         bbox = font.getbbox(text)
-        return bbox[3]
+        with self._measure_cache_lock:
+            self._measure_cache[key] = bbox
+            while len(self._measure_cache) > self.measure_cache_size:
+                self._measure_cache.popitem(last=False)
+        return bbox
+    
+    def get_measure_cache_stats(self) -> Dict[str, int]:
+        """텍스트 측정 결과 캐시 통계 반환"""
+        with self._measure_cache_lock:
+            return {
+                'size': len(self._measure_cache),
+                'max_size': self.measure_cache_size,
+                'hits': self.measure_cache_hits,
+                'misses': self.measure_cache_misses,
+            }
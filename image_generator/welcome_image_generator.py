@@ -1,25 +1,95 @@
+import hashlib
+import time
 from PIL import Image, ImageDraw
-from io import BytesIO
-from typing import Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional
 
 from theme import ThemeManager
 from font_manager import FontManager
-from text_renderer import TextRenderer
+from text_renderer import TextLayout, TextRenderer, TextSegment
 from image_processor import ImageProcessor
+from image_encoder import FORMATS, EncodeOptions, EncodedImage, encode_image, has_transparency
+from http_fetcher import HttpFetcher
 from character_adjustment import CharacterAdjustment
+from config import config
+from font_usage import FontUsage
+from font_report import FontReportLogger
+from metrics import StageTimer, observe_stages
+
+def default_encode_options() -> EncodeOptions:
+    """서버 설정의 기본 인코딩 설정 (알 수 없는 형식이면 매 요청이 인코딩에서 실패하지 않도록 png 사용)"""
+    output_format = config.output_format
+    if output_format not in FORMATS:
+        print(f"알 수 없는 출력 형식: {output_format} (지원: {', '.join(FORMATS)}), 'png' 사용")
+        output_format = 'png'
+    return EncodeOptions(
+        format=output_format,
+        quality=config.output_quality,
+        lossless=config.output_lossless,
+        compress_level=config.png_compress_level,
+        webp_method=config.webp_method
+    )
+
+def create_http_fetcher() -> HttpFetcher:
+    """서버 설정으로 아바타/배경 다운로더 생성"""
+    return HttpFetcher(
+        connect_timeout=config.http_connect_timeout,
+        read_timeout=config.http_read_timeout,
+        total_timeout=config.http_total_timeout,
+        max_bytes=config.http_max_download_bytes,
+        pool_size=config.http_pool_size,
+        cache_bytes=config.http_cache_bytes,
+        default_ttl=config.http_cache_default_ttl
+    )
 
 class WelcomeImageGenerator:
+    # 레이아웃 상수와 폰트 크기의 기준 해상도 (output_width에 맞춰 비례 조정)
+    BASE_WIDTH = 2880
+    BASE_HEIGHT = 1094
+    MIN_OUTPUT_WIDTH = 320
+    # 레이아웃/그리기 코드를 바꿔 같은 요청의 결과가 달라지면 올릴 것 (결과 캐시 무효화)
+    LAYOUT_VERSION = 1
+    
     def __init__(self):
         self.theme_manager = ThemeManager()
-        self.font_manager = FontManager()
-        self.text_renderer = TextRenderer(self.font_manager)
-        self.image_processor = ImageProcessor()
+        self.font_manager = FontManager(
+            font_cache_size=config.font_cache_size,
+            coverage_cache_path=config.font_coverage_cache_path or None
+        )
+        self.text_renderer = TextRenderer(self.font_manager, segment_cache_size=config.text_segment_cache_size,
+                                          measure_cache_size=config.text_measure_cache_size)
+        self.image_processor = ImageProcessor(create_http_fetcher(), image_cache_bytes=config.image_cache_bytes,
+                                              max_image_pixels=config.max_image_pixels)
+        # 배경/프로필 이미지 동시 다운로드용 스레드 풀
+        self.fetch_executor = ThreadPoolExecutor(max_workers=config.fetch_workers, thread_name_prefix='image-fetch')
+        self.font_report_logger = FontReportLogger(
+            self.font_manager,
+            mode=config.font_report_mode,
+            sample_rate=config.font_report_sample_rate
+        )
+        # 요청에서 출력 형식을 지정하지 않았을 때 사용할 인코딩 설정
+        self.default_encode_options = default_encode_options()
         
         # 추가 문자 조정 규칙 설정 (필요시)
         self._setup_custom_adjustments()
     
+    def render_version(self) -> str:
+        """같은 요청이면 같은 이미지가 나오는 렌더링 구성의 해시 (레이아웃 버전, 폰트, 테마, 문자 조정 규칙)"""
+        rules = self.text_renderer.adjustment_rules
+        parts = [
+            self.LAYOUT_VERSION,
+            self.font_manager.configuration_fingerprint(),
+            repr(self.theme_manager.themes),
+            repr((rules.char_rules, rules.range_rules, rules.category_rules)),
+        ]
+        return hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=16).hexdigest()
+    
     def _setup_custom_adjustments(self):
         """커스텀 문자 조정 규칙 설정"""
+        # 설정 파일의 규칙 (코드 수정 없이 조정값 튜닝)
+        if config.character_adjustments_path:
+            self.text_renderer.adjustment_rules.load_rules_file(config.character_adjustments_path)
+        
         # 예시: 특정 문자에 대한 추가 조정
         # self.text_renderer.adjustment_rules.add_char_rule(
         #     '𝑬', 
@@ -38,110 +108,158 @@ class WelcomeImageGenerator:
         strikeout: bool,
         username_color_hex: str,
         suffix_text: str,
-        theme_name: str = 'default'
-    ) -> bytes:
+        theme_name: str = 'default',
+        encode_options: Optional[EncodeOptions] = None,
+        output_width: Optional[int] = None,
+        avatar_data: Optional[bytes] = None,
+        bg_data: Optional[bytes] = None
+    ) -> EncodedImage:
+        """환영 이미지 생성
+        
+        output_width를 지정하면 기준 해상도(2880x1094)로 그린 뒤 줄이는 대신 레이아웃·폰트·프로필 크기를
+        비례해서 줄여 그 너비로 바로 렌더링합니다 (None이면 서버 설정 사용).
+        avatar_data / bg_data로 이미 받아둔 이미지 내용을 넘기면 해당 URL은 다운로드하지 않습니다.
+        """
+        timer = StageTimer()
+        started = time.perf_counter()
         try:
-            # 문자 추적 초기화 (새로운 이미지 생성시마다)
-            self.font_manager.clear_character_tracking()
+            # 요청별 폰트 사용 기록 (동시 요청끼리 공유하지 않음, 리포트 대상 요청만 기록)
+            usage = FontUsage() if self.font_report_logger.should_report() else None
             
             theme = self.theme_manager.get_theme(theme_name)
             
-            width = 2880
-            height = 1094
+            scale = self._output_scale(output_width or config.output_width)
+            
+            width = self._scaled(self.BASE_WIDTH, scale)
+            height = self._scaled(self.BASE_HEIGHT, scale)
+            profile_diameter = self._scaled(480, scale)
+            border_thickness = self._scaled(15, scale)
             
+            # 배경과 프로필 이미지는 서로 독립적이므로 동시에 가져오고, 그동안 텍스트 레이아웃 계산
             if bg_url:
-                background = self.image_processor.load_background_image(bg_url, width, height, theme)
+                background_future = self.fetch_executor.submit(
+                    self.image_processor.load_background_image, bg_url, width, height, theme, bg_data, timer,
+                    fallback=False)
             else:
-                background = self.image_processor.create_background(width, height, theme)
-                
-            draw = ImageDraw.Draw(background)
-            
-            profile_image = self.image_processor.load_profile_image(avatar_url)
-            
-            profile_diameter = 480
-            profile_image = self.image_processor.create_circular_image(profile_image, profile_diameter, theme)
-            
-            # 레이아웃 계산
-            header_y = int(height * 0.08)
-            profile_title_y = int(height * 0.4)
-            subtitle_y = int(height * 0.7)
-            footer_y = int(height * 0.85)
-            
-            profile_x = 0
-            profile_y = profile_title_y - profile_diameter // 2
+                background_future = self.fetch_executor.submit(
+                    self.image_processor.create_background, width, height, theme, timer)
+            profile_future = self.fetch_executor.submit(
+                self.image_processor.load_circular_profile_image, avatar_url, profile_diameter, theme,
+                border_thickness, avatar_data, timer)
             
-            background.paste(profile_image, (profile_x, profile_y), profile_image)
-            
-            username_color = self._parse_color(username_color_hex)
-            
-            if header_text:
-                self._draw_header_text(draw, header_text, width // 2, header_y, theme)
-            
-            title_x = profile_x + profile_diameter + 60
-            title_y = profile_title_y - 100
-            actual_title_font_size = self._draw_title(draw, title_text, title_x, title_y, username_color, strikeout, theme, suffix_text)
+            try:
+                # 레이아웃 계산
+                header_y = int(height * 0.08)
+                profile_title_y = int(height * 0.4)
+                subtitle_y = int(height * 0.7)
+                footer_y = int(height * 0.85)
+                
+                profile_x = 0
+                profile_y = profile_title_y - profile_diameter // 2
+                
+                username_color = self._parse_color(username_color_hex)
+                
+                title_x = profile_x + profile_diameter + self._scaled(60, scale)
+                title_y = profile_title_y - self._scaled(100, scale)
+                
+                # 텍스트는 여기서 한 번씩만 측정하고, 그리기 단계에서는 이 레이아웃을 그대로 사용
+                suffix_layout = self.text_renderer.layout_mixed_text(suffix_text, self._scaled(100, scale))
+                suffix_width = suffix_layout.width
+                with timer.stage('fit_title'):
+                    title_font_size, title_segments = self._fit_title(
+                        title_text, width - title_x - self._scaled(100, scale),
+                        suffix_width + self._scaled(10, scale) if suffix_text else 0,
+                        max_size=self._scaled(260, scale), min_size=self._scaled(50, scale))
+                title_layout = self.text_renderer.layout_mixed_text(title_text, title_font_size, segments=title_segments)
+                title_width = title_layout.width
+                
+                if suffix_text:
+                    suffix_x = title_x + title_width + self._scaled(20, scale)
+                    suffix_end_x = suffix_x + suffix_width
+                else:
+                    suffix_end_x = title_x + title_width
+                
+                header_layout = self.text_renderer.layout_mixed_text(header_text, self._scaled(80, scale))
+                subtitle_layout = self.text_renderer.layout_mixed_text(subtitle_text, self._scaled(105, scale))
+                footer_layout = self.text_renderer.layout_mixed_text(footer_text, self._scaled(70, scale))
+                
+                # 배경을 받지 못하면 테마 배경으로 그리되, 요청과 다른 결과이므로 degraded로 표시
+                degraded = False
+                try:
+                    background = background_future.result()
+                except Exception as e:
+                    print(f"배경 이미지 로드 실패: {e}, 기본 배경 사용")
+                    background = self.image_processor.create_background(width, height, theme, timer)
+                    degraded = True
+                profile_image = profile_future.result()
+            except BaseException:
+                background_future.cancel()
+                profile_future.cancel()
+                raise
             
-            suffix_end_x = title_x
-            if suffix_text:
-                title_width = self.text_renderer.get_mixed_text_width(title_text, actual_title_font_size)
-                suffix_x = title_x + title_width + 20
-                suffix_width = self.text_renderer.get_mixed_text_width(suffix_text, 100)
-                suffix_end_x = suffix_x + suffix_width
-                self._draw_suffix(draw, suffix_text, suffix_x, title_y, actual_title_font_size, theme)
-            else:
-                suffix_end_x = title_x + self.text_renderer.get_mixed_text_width(title_text, actual_title_font_size)
+            encode_options = encode_options or self.default_encode_options
             
-            if subtitle_text:
-                content_start_x = profile_x
-                content_end_x = suffix_end_x
-                content_center_x = (content_start_x + content_end_x) // 2
-                self._draw_subtitle(draw, subtitle_text, content_center_x, subtitle_y, theme)
+            # 텍스트 그림자 등을 그리면 불투명한 배경에도 반투명 픽셀이 생기므로
+            # JPEG 사용 가능 여부는 그리기 전 배경으로 판단
+            transparent = None
+            if encode_options.format == 'jpeg':
+                transparent = has_transparency(background)
             
-            if footer_text:
-                self._draw_footer_text(draw, footer_text, width // 2, footer_y, theme)
+            with timer.stage('render_text'):
+                draw = ImageDraw.Draw(background)
+                
+                background.paste(profile_image, (profile_x, profile_y), profile_image)
+                
+                if header_text:
+                    self._draw_header_text(draw, header_text, width // 2, header_y, theme, usage, header_layout, scale)
+                
+                self._draw_title(draw, title_text, title_x, title_y, username_color, strikeout, theme, suffix_text, usage,
+                                 fitted=(title_font_size, title_segments), scale=scale, layout=title_layout)
+                
+                if suffix_text:
+                    self._draw_suffix(draw, suffix_text, suffix_x, title_y, title_font_size, theme, usage, suffix_layout,
+                                      scale)
+                
+                if subtitle_text:
+                    content_start_x = profile_x
+                    content_end_x = suffix_end_x
+                    content_center_x = (content_start_x + content_end_x) // 2
+                    self._draw_subtitle(draw, subtitle_text, content_center_x, subtitle_y, theme, usage, subtitle_layout,
+                                        scale)
+                
+                if footer_text:
+                    self._draw_footer_text(draw, footer_text, width // 2, footer_y, theme, usage, footer_layout, scale)
+                
+            with timer.stage('encode'):
+                encoded = encode_image(background, encode_options, transparent)
             
-            img_byte_array = BytesIO()
-            background.save(img_byte_array, format='PNG')
-            img_byte_array.seek(0)
+            timer.seconds['total'] = time.perf_counter() - started
+            encoded.stage_seconds = timer.seconds
+            encoded.degraded = degraded
+            observe_stages(timer.seconds)
             
-            # 폰트 지원 리포트 출력
-            self._print_font_reports()
+            # 폰트 지원 리포트는 백그라운드에서 출력
+            if usage is not None:
+                self.font_report_logger.submit(usage)
             
-            return img_byte_array.getvalue()
+            return encoded
             
         except Exception as e:
             print(f"이미지 생성 중 오류 발생: {str(e)}")
             raise
     
-    def _print_font_reports(self):
-        """폰트 관련 리포트들을 출력"""
-        print("\n" + "="*60)
-        print("🔍 폰트 사용 분석 리포트")
-        print("="*60)
-        
-        # 1. 폰트 사용 통계
-        usage_report = self.font_manager.get_font_usage_statistics()
-        if "폰트 사용 통계가 없습니다." not in usage_report:
-            print("\n📊 폰트 사용 통계:")
-            print("-" * 40)
-            print(usage_report)
-        
-        # 2. 지원되지 않는 문자 리포트
-        unsupported_report = self.font_manager.get_unsupported_characters_report()
-        if "모든 문자가 지원됩니다." not in unsupported_report:
-            print("\n❌ 지원되지 않는 문자:")
-            print("-" * 40)
-            print(unsupported_report)
-        
-        # 3. 지원되는 문자 리포트 (디버깅용)
-        supported_report = self.font_manager.get_supported_characters_report()
-        if "지원되는 문자가 없습니다." not in supported_report:
-            print("\n✅ 지원되는 문자 (상세):")
-            print("-" * 40)
-            print(supported_report)
-        
-        print("="*60)
-
+    def _output_scale(self, output_width: int) -> float:
+        """출력 너비를 기준 해상도 대비 배율로 변환"""
+        if not self.MIN_OUTPUT_WIDTH <= output_width <= self.BASE_WIDTH:
+            raise ValueError(
+                f"출력 너비는 {self.MIN_OUTPUT_WIDTH} ~ {self.BASE_WIDTH} 사이여야 합니다: {output_width}")
+        return output_width / self.BASE_WIDTH
+    
+    @staticmethod
+    def _scaled(value: int, scale: float) -> int:
+        """기준 해상도의 픽셀 값을 배율에 맞게 변환 (scale 1.0이면 그대로)"""
+        return max(1, round(value * scale))
+    
     def _parse_color(self, color_hex: str) -> Tuple[int, int, int]:
         """16진수 색상 코드를 RGB 튜플로 변환"""
         if not color_hex:
@@ -151,44 +269,96 @@ class WelcomeImageGenerator:
         return tuple(int(color_hex[i:i+2], 16) for i in (0, 2, 4))
     
     def _draw_title(self, draw: ImageDraw, text: str, x: int, y: int, 
-                    color: Tuple[int, int, int], strikeout: bool, theme, suffix_text: str = "") -> int:
-        """타이틀 텍스트 그리기"""
-        font_size = 260
-        suffix_font_size = 100
-        
-        max_width = 2880 - x - 100
-        
-        # 타이틀과 접미사의 전체 너비 계산
-        while font_size > 50:
-            title_width = self.text_renderer.get_mixed_text_width(text, font_size)
-            suffix_width = 0
-            if suffix_text:
-                suffix_width = self.text_renderer.get_mixed_text_width(suffix_text, suffix_font_size) + 10  # 20은 타이틀과 접미사 사이 간격
+                    color: Tuple[int, int, int], strikeout: bool, theme, suffix_text: str = "",
+                    usage: Optional[FontUsage] = None,
+                    fitted: Optional[Tuple[int, List[TextSegment]]] = None,
+                    scale: float = 1.0, layout: Optional[TextLayout] = None) -> int:
+        """타이틀 텍스트 그리기 (fitted: 미리 계산한 _fit_title 결과, layout: 그 크기로 측정한 레이아웃)"""
+        if fitted is None:
+            suffix_font_size = self._scaled(100, scale)
             
-            total_width = title_width + suffix_width
+            max_width = self._scaled(self.BASE_WIDTH, scale) - x - self._scaled(100, scale)
             
-            if total_width <= max_width:
-                break
+            # 접미사 너비는 타이틀 크기와 무관하므로 한 번만 계산
+            suffix_width = 0
+            if suffix_text:
+                suffix_width = self.text_renderer.get_mixed_text_width(suffix_text, suffix_font_size) + self._scaled(10, scale)  # 20은 타이틀과 접미사 사이 간격
             
-            font_size -= 1
+            fitted = self._fit_title(text, max_width, suffix_width,
+                                     max_size=self._scaled(260, scale), min_size=self._scaled(50, scale))
+        font_size, segments = fitted
         
         actual_width = self.text_renderer.render_mixed_text(
             draw, text, x, y, color, font_size, 
-            shadow=theme.text_shadow, shadow_offset=3
-        )
+            shadow=theme.text_shadow, shadow_offset=self._scaled(3, scale), segments=segments, usage=usage,
+            layout=layout
+        ).width
         
         if strikeout:
             line_y = y + (font_size // 2)
             draw.line((x, line_y, x + actual_width, line_y), 
                      fill=(255, 255, 255) if color == (255, 255, 255) else (192, 192, 192), 
-                     width=20)
+                     width=self._scaled(20, scale))
         
         return font_size
     
-    def _draw_subtitle(self, draw: ImageDraw, text: str, x: int, y: int, theme):
+    def _fit_title(self, text: str, max_width: int, suffix_width: int = 0,
+                   max_size: int = 260, min_size: int = 50) -> Tuple[int, List[TextSegment]]:
+        """타이틀+접미사가 max_width 안에 들어가는 가장 큰 폰트 크기와 그 크기의 세그먼트 반환
+        
+        너비가 폰트 크기에 비례한다는 가정으로 첫 추정값을 구한 뒤 이분 탐색으로 보정합니다.
+        max_size부터 1씩 줄여가며 찾는 방식과 같은 크기를 반환하며, min_size까지 내려가면
+        (기존 루프와 마찬가지로) 측정 없이 min_size를 사용합니다.
+        """
+        measured = {}
+        
+        def measure(size: int) -> Tuple[List[TextSegment], int]:
+            if size not in measured:
+                segments = self.text_renderer.segment_text_by_font_support(text, size)
+                measured[size] = (segments, self.text_renderer.get_segments_width(segments))
+            return measured[size]
+        
+        def fits(size: int) -> bool:
+            return measure(size)[1] + suffix_width <= max_width
+        
+        if fits(max_size):
+            return max_size, measure(max_size)[0]
+        
+        # 불변식: hi는 들어가지 않고, lo는 들어가거나 min_size
+        lo, hi = min_size, max_size
+        
+        # 너비가 크기에 선형 비례한다고 보고 추정한 크기와 그 바로 위/아래부터 확인
+        max_width_at_hi = measure(max_size)[1]
+        if max_width_at_hi > 0 and hi - lo > 1:
+            guess = int((max_width - suffix_width) * max_size / max_width_at_hi)
+            guess = min(max(guess, lo + 1), hi - 1)
+            if fits(guess):
+                lo = guess
+                if lo + 1 < hi and not fits(lo + 1):
+                    hi = lo + 1
+            else:
+                hi = guess
+                if hi - 1 > lo and fits(hi - 1):
+                    lo = hi - 1
+        
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if fits(mid):
+                lo = mid
+            else:
+                hi = mid
+        
+        return lo, measure(lo)[0]
+    
+    def _draw_subtitle(self, draw: ImageDraw, text: str, x: int, y: int, theme,
+                       usage: Optional[FontUsage] = None,
+                       layout: Optional[TextLayout] = None,
+                       scale: float = 1.0):
         """서브타이틀 텍스트 그리기"""
-        font_size = 105
-        text_width = self.text_renderer.get_mixed_text_width(text, font_size)
+        font_size = self._scaled(105, scale)
+        if layout is None:
+            layout = self.text_renderer.layout_mixed_text(text, font_size)
+        text_width = layout.width
         
         # 중앙 정렬된 x 좌표 계산
         subtitle_x = x - text_width // 2
@@ -199,32 +369,45 @@ class WelcomeImageGenerator:
         
         self.text_renderer.render_mixed_text(
             draw, text, subtitle_x, y, (230, 230, 230), font_size,
-            shadow=theme.text_shadow, shadow_offset=2
+            shadow=theme.text_shadow, shadow_offset=self._scaled(2, scale), usage=usage, layout=layout
         )
     
-    def _draw_header_text(self, draw: ImageDraw, text: str, x: int, y: int, theme):
+    def _draw_header_text(self, draw: ImageDraw, text: str, x: int, y: int, theme,
+                          usage: Optional[FontUsage] = None,
+                          layout: Optional[TextLayout] = None,
+                          scale: float = 1.0):
         """헤더 텍스트 그리기"""
-        font_size = 80
-        text_width = self.text_renderer.get_mixed_text_width(text, font_size)
+        font_size = self._scaled(80, scale)
+        if layout is None:
+            layout = self.text_renderer.layout_mixed_text(text, font_size)
+        text_width = layout.width
         
         self.text_renderer.render_mixed_text(
             draw, text, x - text_width // 2, y, (230, 230, 230), font_size,
-            shadow=theme.text_shadow, shadow_offset=2
+            shadow=theme.text_shadow, shadow_offset=self._scaled(2, scale), usage=usage, layout=layout
         )
     
-    def _draw_footer_text(self, draw: ImageDraw, text: str, x: int, y: int, theme):
+    def _draw_footer_text(self, draw: ImageDraw, text: str, x: int, y: int, theme,
+                          usage: Optional[FontUsage] = None,
+                          layout: Optional[TextLayout] = None,
+                          scale: float = 1.0):
         """푸터 텍스트 그리기"""
-        font_size = 70
-        text_width = self.text_renderer.get_mixed_text_width(text, font_size)
+        font_size = self._scaled(70, scale)
+        if layout is None:
+            layout = self.text_renderer.layout_mixed_text(text, font_size)
+        text_width = layout.width
         
         self.text_renderer.render_mixed_text(
             draw, text, x - text_width // 2, y, (230, 230, 230), font_size,
-            shadow=theme.text_shadow, shadow_offset=2
+            shadow=theme.text_shadow, shadow_offset=self._scaled(2, scale), usage=usage, layout=layout
         )
     
-    def _draw_suffix(self, draw: ImageDraw, text: str, x: int, y: int, title_font_size: int, theme):
+    def _draw_suffix(self, draw: ImageDraw, text: str, x: int, y: int, title_font_size: int, theme,
+                     usage: Optional[FontUsage] = None,
+                     layout: Optional[TextLayout] = None,
+                     scale: float = 1.0):
         """접미사 텍스트 그리기"""
-        suffix_font_size = 100
+        suffix_font_size = self._scaled(100, scale)
         
         title_font = self.font_manager.get_font(title_font_size, 'korean')
         suffix_font = self.font_manager.get_font(suffix_font_size, 'korean')
@@ -233,9 +416,9 @@ class WelcomeImageGenerator:
         suffix_bottom = self.text_renderer.get_text_bottom_offset(suffix_font)
         
         bottom_diff = title_bottom - suffix_bottom
-        adjusted_y = y + bottom_diff - 15
+        adjusted_y = y + bottom_diff - self._scaled(15, scale)
         
         self.text_renderer.render_mixed_text(
             draw, text, x, adjusted_y, (230, 230, 230), suffix_font_size,
-            shadow=theme.text_shadow, shadow_offset=2
+            shadow=theme.text_shadow, shadow_offset=self._scaled(2, scale), usage=usage, layout=layout
         )
@@ -0,0 +1,71 @@
+"""ImageProcessor 디코딩 테스트 - reduce()로 줄여야 하는 큰 이미지의 모드별 처리
+
+    python -m pytest tests
+"""
+import os
+import sys
+from io import BytesIO
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'image_generator'))
+
+from PIL import Image
+from image_processor import ImageProcessor
+from theme import ThemeManager
+
+SOURCE_SIZE = 2000
+
+
+def _encode(image: Image.Image, image_format: str, **params) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **params)
+    return buffer.getvalue()
+
+
+def _palette_image() -> Image.Image:
+    return Image.linear_gradient('L').resize((SOURCE_SIZE, SOURCE_SIZE)).convert('RGB').convert('P')
+
+
+# (설명, 이미지 내용) - 모두 reduce()가 직접 처리하지 못하는 모드로 디코딩됨
+LARGE_IMAGES = [
+    ('palette png', _encode(_palette_image(), 'PNG')),
+    ('palette png with transparency', _encode(_palette_image(), 'PNG', transparency=0)),
+    ('gif', _encode(_palette_image(), 'GIF')),
+    ('1-bit png', _encode(Image.new('1', (SOURCE_SIZE, SOURCE_SIZE), 1), 'PNG')),
+]
+
+
+@pytest.fixture(scope='module')
+def theme():
+    return ThemeManager().get_theme('default')
+
+
+@pytest.mark.parametrize('data', [data for _, data in LARGE_IMAGES], ids=[name for name, _ in LARGE_IMAGES])
+def test_circular_avatar_from_large_image(data, theme):
+    processor = ImageProcessor()
+    avatar = processor.load_circular_profile_image('', 480, theme, data=data)
+    assert avatar.mode == 'RGBA'
+    assert avatar.size == (480 + 2 * 15, 480 + 2 * 15)
+
+
+@pytest.mark.parametrize('data', [data for _, data in LARGE_IMAGES], ids=[name for name, _ in LARGE_IMAGES])
+def test_background_from_large_image(data, theme):
+    processor = ImageProcessor()
+    background = processor.load_background_image('', 480, 270, theme, data=data, fallback=False)
+    assert background.mode == 'RGBA'
+    assert background.size == (480, 270)
+
+
+def test_decode_image_reduces_palette_image():
+    image = ImageProcessor().decode_image(_encode(_palette_image(), 'PNG'), (480, 480))
+    assert image.mode == 'RGB'
+    assert image.width >= 480 and image.width < SOURCE_SIZE
+
+
+def test_decode_image_cover_keeps_aspect_ratio():
+    data = _encode(Image.new('RGB', (4000, 1000)), 'PNG')
+    image = ImageProcessor().decode_image(data, (960, 540), cover=True)
+    # 높이 540을 덮는 크기(2160x540) 이상으로만 줄임
+    assert image.height >= 540 and image.width >= 2160
+    assert image.width * 1000 == image.height * 4000